@@ -0,0 +1,21 @@
+    .text
+    .global main
+main:
+    la t0, a
+    la t1, b
+    # 两个缺失的 load 都交给 MSHR
+    lw a1, 0(t0)
+    lw a2, 0(t1)
+    # 读写同一个仍在等待回填的 rd，以及只写另一个等待回填的 rd
+    addi a1, a1, 1
+    li a2, 7
+    add a0, a1, a2
+    ret
+
+    .data
+    .balign 64
+a:
+    .word 100
+    .balign 64
+b:
+    .word 1000
@@ -0,0 +1,29 @@
+    .text
+    .global main
+main:
+    addi sp, sp, -16
+    sw ra, 12(sp)
+    li a0, 0
+    # 第一次调用后 bump 已在 I-cache 中
+    jal bump
+    # 把 bump 的第一条指令改为 addi a0, a0, 100
+    la t0, bump
+    la t1, patch
+    lw t1, 0(t1)
+    sw t1, 0(t0)
+    li t2, 32
+1:
+    addi t2, t2, -1
+    bnez t2, 1b
+    jal bump
+    lw ra, 12(sp)
+    addi sp, sp, 16
+    ret
+
+bump:
+    addi a0, a0, 1
+    ret
+
+    .data
+patch:
+    addi a0, a0, 100
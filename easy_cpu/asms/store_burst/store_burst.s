@@ -0,0 +1,32 @@
+    .text
+    .global main
+main:
+    la t0, buf
+    li t1, 1
+    # 连续写 12 个不同的行，store buffer 写满后流水线停顿
+    sw t1, 0(t0)
+    sw t1, 16(t0)
+    sw t1, 32(t0)
+    sw t1, 48(t0)
+    sw t1, 64(t0)
+    sw t1, 80(t0)
+    sw t1, 96(t0)
+    sw t1, 112(t0)
+    sw t1, 128(t0)
+    sw t1, 144(t0)
+    sw t1, 160(t0)
+    sw t1, 176(t0)
+    li a0, 0
+    li t2, 12
+1:
+    lw t3, 0(t0)
+    add a0, a0, t3
+    addi t0, t0, 16
+    addi t2, t2, -1
+    bnez t2, 1b
+    ret
+
+    .data
+    .balign 16
+buf:
+    .zero 192
@@ -0,0 +1,15 @@
+    .text
+    .global main
+main:
+    la t0, buf
+    li a0, 42
+    # 返回时 store buffer 中仍有未写入缓存的 store
+    sw a0, 0(t0)
+    sw a0, 16(t0)
+    sw a0, 32(t0)
+    ret
+
+    .data
+    .balign 16
+buf:
+    .zero 48
@@ -0,0 +1,32 @@
+    .text
+    .global main
+main:
+    la t0, buf
+    li t1, 1
+    li t2, 2
+    li t3, 3
+    li t4, 4
+    li t5, 5
+    # buf 所在的行不在 D-cache 中，队首写不进缓存，之后的 store 都留在 store buffer 中
+    sw t1, 0(t0)
+    sw t2, 4(t0)
+    sw t3, 8(t0)
+    sw t4, 12(t0)
+    sw t5, 4(t0)
+    # 队首之后的项，同一字取最新的一项
+    lw a0, 8(t0)
+    lw a1, 4(t0)
+    lw a2, 12(t0)
+    lw a3, 0(t0)
+    slli a1, a1, 4
+    slli a2, a2, 8
+    slli a3, a3, 12
+    add a0, a0, a1
+    add a0, a0, a2
+    add a0, a0, a3
+    ret
+
+    .data
+    .balign 16
+buf:
+    .word 0, 0, 0, 0
@@ -0,0 +1,248 @@
+import numpy as np
+
+from alu import ALU_LEN, RV32I_ALU
+from instruction import (
+    BTypeInstruction,
+    Instructions,
+    ITypeInstruction,
+    JTypeInstruction,
+    OperantFrom,
+    RTypeInstruction,
+    STypeInstruction,
+    UTypeInstruction,
+)
+from iss import MASK
+from perf_counter import PerfEvent
+
+# 每页 4 KiB
+PAGE_BITS = 12
+PAGE_WORDS = 1 << (PAGE_BITS - 2)
+
+KINDS = list(Instructions)
+CLASSES = [RTypeInstruction, ITypeInstruction, STypeInstruction, BTypeInstruction, UTypeInstruction, JTypeInstruction]
+
+
+def kind_table(fn, dtype) -> np.ndarray:
+    # 末尾多出的一项对应非法指令（kind = -1）
+    return np.array([fn(kind) for kind in KINDS] + [0], dtype=dtype)
+
+
+CLASS = kind_table(lambda kind: CLASSES.index(type(kind.value)), np.int64)
+ALU_OP = kind_table(lambda kind: kind.value.alu_info.alu_op.value, np.int64)
+OPERANT1_FROM = kind_table(lambda kind: kind.value.alu_info.operant1_from.value, np.int64)
+OPERANT2_FROM = kind_table(lambda kind: kind.value.alu_info.operant2_from.value, np.int64)
+HAS_RD = kind_table(lambda kind: kind.value.has_rd, bool)
+HAS_RS1 = kind_table(lambda kind: kind.value.has_rs1, bool)
+HAS_RS2 = kind_table(lambda kind: kind.value.has_rs2, bool)
+IS_BRANCH = kind_table(lambda kind: isinstance(kind.value, BTypeInstruction), bool)
+BRANCH_FLIP = kind_table(lambda kind: getattr(kind.value, "branch_flip", False), bool)
+IS_STORE = kind_table(lambda kind: isinstance(kind.value, STypeInstruction), bool)
+IS_LOAD = kind_table(
+    lambda kind: isinstance(kind.value, ITypeInstruction) and kind.value.memory_operation is not None, bool
+)
+IS_JAL = kind_table(lambda kind: kind == Instructions.JAL, bool)
+IS_JALR = kind_table(lambda kind: kind == Instructions.JALR, bool)
+IS_EBREAK = kind_table(lambda kind: kind == Instructions.EBREAK, bool)
+
+
+def sext_np(value: np.ndarray, bits) -> np.ndarray:
+    sign = np.int64(1) << (np.asarray(bits, dtype=np.int64) - 1)
+    return ((value & (sign - 1)) - (value & sign)) & MASK
+
+
+def to_signed_np(value: np.ndarray) -> np.ndarray:
+    return value - ((value & 0x80000000) << 1)
+
+
+def alu_np(op: np.ndarray, operant1: np.ndarray, operant2: np.ndarray) -> np.ndarray:
+    # 与 alu.alu 保持一致：算出所有结果后按 op 选择，输入输出都是 int64 表示的 32 位无符号数
+    shifter = operant2 & 0x1F
+
+    values = [np.zeros_like(operant1)] * ALU_LEN
+    values[RV32I_ALU.ADD.value] = (operant1 + operant2) & MASK
+    values[RV32I_ALU.SUB.value] = (operant1 - operant2) & MASK
+    values[RV32I_ALU.SLL.value] = (operant1 << shifter) & MASK
+    values[RV32I_ALU.SLT.value] = (to_signed_np(operant1) < to_signed_np(operant2)).astype(np.int64)
+    values[RV32I_ALU.SLTU.value] = (operant1 < operant2).astype(np.int64)
+    values[RV32I_ALU.XOR.value] = operant1 ^ operant2
+    values[RV32I_ALU.SRA.value] = (to_signed_np(operant1) >> shifter) & MASK
+    values[RV32I_ALU.SRL.value] = operant1 >> shifter
+    values[RV32I_ALU.OR.value] = operant1 | operant2
+    values[RV32I_ALU.AND.value] = operant1 & operant2
+
+    return np.choose(op, values)
+
+
+def decode_kinds(words: np.ndarray) -> np.ndarray:
+    opcode = words & 0x7F
+    funct3 = (words >> 12) & 0x7
+    funct7 = words >> 25
+
+    kinds = np.full(words.shape, -1, dtype=np.int64)
+    for index, kind in enumerate(KINDS):
+        instruction = kind.value
+        match = (kinds < 0) & (opcode == instruction.opcode)
+        if instruction.funct3 is not None:
+            match &= funct3 == instruction.funct3
+        if instruction.funct7 is not None:
+            match &= funct7 == instruction.funct7
+        kinds[match] = index
+    return kinds
+
+
+def decode_imm(words: np.ndarray, classes: np.ndarray) -> np.ndarray:
+    i_imm = sext_np(words >> 20, 12)
+    s_imm = sext_np(((words >> 25) << 5) | ((words >> 7) & 0x1F), 12)
+    b_imm = sext_np(
+        (((words >> 31) & 1) << 12)
+        | (((words >> 7) & 1) << 11)
+        | (((words >> 25) & 0x3F) << 5)
+        | (((words >> 8) & 0xF) << 1),
+        13,
+    )
+    u_imm = words & 0xFFFFF000
+    j_imm = sext_np(
+        (((words >> 31) & 1) << 20)
+        | (((words >> 12) & 0xFF) << 12)
+        | (((words >> 20) & 1) << 11)
+        | (((words >> 21) & 0x3FF) << 1),
+        21,
+    )
+    return np.choose(classes, [np.zeros_like(words), i_imm, s_imm, b_imm, u_imm, j_imm])
+
+
+class BatchISS:
+    """Steps N independent harts in lockstep; each lane follows the same semantics as ISS."""
+
+    lanes: int
+    regs: np.ndarray
+    pc: np.ndarray
+    instret: np.ndarray
+    halted: np.ndarray
+    # 遇到非法指令的 lane 同时被置为 halted
+    faulted: np.ndarray
+    # 页号 -> (N, PAGE_WORDS) 的字数组
+    pages: dict[int, np.ndarray]
+
+    def __init__(self, images: list[list[int]]):
+        self.lanes = len(images)
+        self.regs = np.zeros((self.lanes, 32), dtype=np.uint32)
+        self.pc = np.zeros(self.lanes, dtype=np.uint32)
+        self.instret = np.zeros(self.lanes, dtype=np.int64)
+        self.halted = np.zeros(self.lanes, dtype=bool)
+        self.faulted = np.zeros(self.lanes, dtype=bool)
+        self.pages = {}
+
+        for lane, image in enumerate(images):
+            for start in range(0, len(image), PAGE_WORDS):
+                chunk = image[start : start + PAGE_WORDS]
+                self.page(start // PAGE_WORDS)[lane, : len(chunk)] = chunk
+
+    @classmethod
+    def from_hex(cls, paths: list[str]) -> "BatchISS":
+        images = []
+        for path in paths:
+            with open(path, "r") as f:
+                images.append([int(line, 16) for line in f if line.strip()])
+        return cls(images)
+
+    def page(self, number: int) -> np.ndarray:
+        page = self.pages.get(number)
+        if page is None:
+            page = np.zeros((self.lanes, PAGE_WORDS), dtype=np.uint32)
+            self.pages[number] = page
+        return page
+
+    def read_words(self, lanes: np.ndarray, word_addr: np.ndarray) -> np.ndarray:
+        numbers = word_addr >> (PAGE_BITS - 2)
+        offsets = word_addr & (PAGE_WORDS - 1)
+        out = np.zeros(lanes.shape, dtype=np.int64)
+        for number in np.unique(numbers):
+            page = self.pages.get(int(number))
+            if page is None:
+                continue
+            match = numbers == number
+            out[match] = page[lanes[match], offsets[match]]
+        return out
+
+    def write_words(self, lanes: np.ndarray, word_addr: np.ndarray, values: np.ndarray):
+        numbers = word_addr >> (PAGE_BITS - 2)
+        offsets = word_addr & (PAGE_WORDS - 1)
+        for number in np.unique(numbers):
+            match = numbers == number
+            self.page(int(number))[lanes[match], offsets[match]] = values[match]
+
+    def step(self):
+        lanes = np.flatnonzero(~self.halted)
+        if lanes.size == 0:
+            return
+
+        pc = self.pc[lanes].astype(np.int64)
+        words = self.read_words(lanes, pc >> 2)
+        kinds = decode_kinds(words)
+
+        invalid = kinds < 0
+        if invalid.any():
+            self.faulted[lanes[invalid]] = True
+            self.halted[lanes[invalid]] = True
+            lanes, pc, words, kinds = lanes[~invalid], pc[~invalid], words[~invalid], kinds[~invalid]
+
+        rd = np.where(HAS_RD[kinds], (words >> 7) & 0x1F, 0)
+        rs1 = np.where(HAS_RS1[kinds], (words >> 15) & 0x1F, 0)
+        rs2 = np.where(HAS_RS2[kinds], (words >> 20) & 0x1F, 0)
+        funct3 = (words >> 12) & 0x7
+        imm = decode_imm(words, CLASS[kinds])
+
+        rs1_value = self.regs[lanes, rs1].astype(np.int64)
+        rs2_value = self.regs[lanes, rs2].astype(np.int64)
+        # 只模拟 instret，其余计数器读为 0
+        csr = np.where((imm & 0xFFF) == PerfEvent.INSTRET.value, self.instret[lanes] & MASK, 0)
+
+        operants = [None] * len(OperantFrom)
+        operants[OperantFrom.RS1.value] = rs1_value
+        operants[OperantFrom.RS2.value] = rs2_value
+        operants[OperantFrom.IMM.value] = imm
+        operants[OperantFrom.PC.value] = pc
+        operants[OperantFrom.LITERAL_FOUR.value] = np.full_like(pc, 4)
+        operants[OperantFrom.CSR.value] = csr
+        result = alu_np(ALU_OP[kinds], np.choose(OPERANT1_FROM[kinds], operants), np.choose(OPERANT2_FROM[kinds], operants))
+
+        # funct3 低两位为访问宽度，第 2 位表示无符号扩展
+        size_bits = np.int64(8) << np.minimum(funct3 & 0x3, 2)
+        width_mask = (np.int64(1) << size_bits) - 1
+        shift = (result & 0x3) * 8
+
+        is_load = IS_LOAD[kinds]
+        if is_load.any():
+            raw = (self.read_words(lanes[is_load], result[is_load] >> 2) >> shift[is_load]) & width_mask[is_load]
+            signed = ((funct3[is_load] & 0x4) == 0) & (size_bits[is_load] < 32)
+            result[is_load] = np.where(signed, sext_np(raw, size_bits[is_load]), raw)
+
+        is_store = IS_STORE[kinds]
+        if is_store.any():
+            store_lanes = lanes[is_store]
+            word_addr = result[is_store] >> 2
+            mask = width_mask[is_store] << shift[is_store]
+            old = self.read_words(store_lanes, word_addr)
+            new = (old & ~mask) | ((rs2_value[is_store] << shift[is_store]) & mask)
+            self.write_words(store_lanes, word_addr, new)
+
+        taken = IS_BRANCH[kinds] & ((result != 0) ^ BRANCH_FLIP[kinds])
+        next_pc = np.where(taken | IS_JAL[kinds], pc + imm, pc + 4) & MASK
+        next_pc = np.where(IS_JALR[kinds], (rs1_value + imm) & MASK & ~1, next_pc)
+
+        is_ebreak = IS_EBREAK[kinds]
+        next_pc = np.where(is_ebreak, pc, next_pc)
+        self.halted[lanes[is_ebreak]] = True
+
+        write = (rd != 0) & ~is_ebreak & ~is_store & ~IS_BRANCH[kinds]
+        self.regs[lanes[write], rd[write]] = result[write]
+
+        self.pc[lanes] = next_pc
+        self.instret[lanes] += 1
+
+    def run(self, max_steps: int = 1000000):
+        for _ in range(max_steps):
+            if self.halted.all():
+                break
+            self.step()
@@ -0,0 +1,36 @@
+from assassyn.frontend import *
+from utils import Bool
+
+
+class BranchTargetBuffer:
+    bits: int
+
+    valid: Array
+    tags: Array
+    targets: Array
+
+    def __init__(self, bits: int):
+        # 指令 4 字节对齐，低两位不参与索引与标签
+        assert 0 < bits < 30
+        self.bits = bits
+        size = 1 << bits
+        self.valid = RegArray(Bool, size)
+        self.tags = RegArray(Bits(30 - bits), size)
+        self.targets = RegArray(Bits(32), size)
+
+    def extract_index(self, addr: Value) -> Value:
+        return addr[2 : (self.bits + 1)]
+
+    def extract_tag(self, addr: Value) -> Value:
+        return addr[(self.bits + 2) : 31]
+
+    def lookup(self, addr: Value) -> tuple[Value, Value]:
+        index = self.extract_index(addr)
+        hit = self.valid[index] & (self.tags[index] == self.extract_tag(addr))
+        return hit, self.targets[index]
+
+    def update(self, addr: Value, target: Value):
+        index = self.extract_index(addr)
+        self.valid[index] = Bool(1)
+        self.tags[index] = self.extract_tag(addr)
+        self.targets[index] = target
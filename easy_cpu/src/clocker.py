@@ -6,6 +6,11 @@ class Driver(Module):
         super().__init__(ports={})
 
     @module.combinational
-    def build(self, modules: list[Module]):
+    def build(self, modules: list[Module], halted: Array | None = None):
+        # 停机标志在 EBREAK 写回的下一个周期可见，此时结束仿真
+        if halted is not None:
+            with Condition(halted[0]):
+                finish()
+
         for module in modules:
             module.async_called()
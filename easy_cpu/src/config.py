@@ -0,0 +1,94 @@
+from dataclasses import asdict, dataclass, fields, replace
+from itertools import product
+
+from cpu import CPU
+from predictor import (
+    AlwaysBranchPredictor,
+    BinaryPredictor,
+    BinaryPredictState,
+    GsharePredictor,
+    NeverBranchPredictor,
+    Predictor,
+    TournamentPredictor,
+)
+from write_back import TraceLevel
+
+
+@dataclass(frozen=True)
+class CPUConfig:
+    # always / never / binary / gshare / tournament
+    predictor: str = "binary"
+    bits: int = 5
+    init_state: str = "WeaklyB"
+    history_bits: int = 4
+    local_bits: int = 5
+    chooser_bits: int = 5
+    folded: bool = False
+    btb_bits: int = 4
+    ras_depth: int = 4
+    memory_size: int = 0x10000
+    icache_sets: int = 16
+    icache_ways: int = 2
+    icache_line_words: int = 4
+    icache_latency: int = 2
+    dcache_sets: int = 16
+    dcache_ways: int = 2
+    dcache_line_words: int = 4
+    dcache_latency: int = 2
+    dcache_mshrs: int = 2
+    prefetch_bits: int = 4
+    store_buffer: int = 4
+
+    def make_predictor(self) -> Predictor:
+        init_state = BinaryPredictState[self.init_state]
+        match self.predictor:
+            case "always":
+                return AlwaysBranchPredictor()
+            case "never":
+                return NeverBranchPredictor()
+            case "binary":
+                return BinaryPredictor(self.bits, init_state, self.folded)
+            case "gshare":
+                return GsharePredictor(self.bits, self.history_bits, init_state, self.folded)
+            case "tournament":
+                return TournamentPredictor(
+                    self.local_bits, self.bits, self.history_bits, self.chooser_bits, init_state, self.folded
+                )
+        raise ValueError(f"Unknown predictor: {self.predictor}")
+
+    def build(self, sram_file: str | None, verbose: bool = False, trace_level: TraceLevel = TraceLevel.OFF) -> CPU:
+        return CPU(
+            sram_file,
+            self.make_predictor,
+            verbose=verbose,
+            btb_bits=self.btb_bits,
+            ras_depth=self.ras_depth,
+            trace_level=trace_level,
+            memory_size=self.memory_size,
+            icache_sets=self.icache_sets,
+            icache_ways=self.icache_ways,
+            icache_line_words=self.icache_line_words,
+            icache_latency=self.icache_latency,
+            dcache_sets=self.dcache_sets,
+            dcache_ways=self.dcache_ways,
+            dcache_line_words=self.dcache_line_words,
+            dcache_latency=self.dcache_latency,
+            dcache_mshrs=self.dcache_mshrs,
+            prefetch_bits=self.prefetch_bits,
+            store_buffer=self.store_buffer,
+        )
+
+    def label(self) -> str:
+        default = CPUConfig()
+        changed = [f"{k}={v}" for k, v in asdict(self).items() if k == "predictor" or getattr(default, k) != v]
+        return ",".join(changed)
+
+
+def expand_grid(grid: dict[str, list]) -> list[CPUConfig]:
+    names = {field.name for field in fields(CPUConfig)}
+    for name in grid:
+        if name not in names:
+            raise ValueError(f"Unknown configuration field: {name}")
+
+    keys = list(grid)
+    return [replace(CPUConfig(), **dict(zip(keys, values))) for values in product(*grid.values())]
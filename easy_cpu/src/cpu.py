@@ -1,27 +1,34 @@
 from typing import Callable
 from assassyn.frontend import *
+from btb import BranchTargetBuffer
 from bypass import Bypasser
 from clocker import Driver
+from dcache import DCache
 from decoder import Decoder
 from executor import Executor
 from memory import Memory
+from perf_counter import PerfCounter
+from ras import ReturnAddressStack
 from predictor import (
     AlwaysBranchPredictor,
-    PredictFeedback,
     Predictor,
 )
 from reg_file import RegFile, RegOccupation
 from fetcher import Fetcher, FetcherImpl
-from utils import Bool
-from write_back import WriteBack
+from icache import ICache
+from main_memory import MainMemory
+from write_back import TraceLevel, WriteBack
 
 
 class CPU:
     reg_file: RegFile
     reg_occupation: RegOccupation
 
-    icache: SRAM
-    dcache: SRAM
+    main_memory: MainMemory
+    icache: ICache
+    dcache: DCache
+    btb: BranchTargetBuffer
+    ras: ReturnAddressStack
 
     fetcher: Fetcher
     fetcher_impl: FetcherImpl
@@ -31,6 +38,7 @@ class CPU:
     write_back: WriteBack
     bypasser: Bypasser
     predictor: Predictor
+    perf_counter: PerfCounter
 
     clocker: Driver
 
@@ -39,50 +47,126 @@ class CPU:
         return AlwaysBranchPredictor()
 
     def __init__(
-        self, sram_file: str | None, predictor_fn: Callable[[], Predictor] = default_predictor, verbose: bool = False
+        self,
+        sram_file: str | None,
+        predictor_fn: Callable[[], Predictor] = default_predictor,
+        verbose: bool = False,
+        btb_bits: int = 4,
+        ras_depth: int = 4,
+        instrument: bool = False,
+        trace_level: TraceLevel = TraceLevel.FULL,
+        memory_size: int = 0x10000,
+        icache_sets: int = 16,
+        icache_ways: int = 2,
+        icache_line_words: int = 4,
+        icache_latency: int = 2,
+        dcache_sets: int = 16,
+        dcache_ways: int = 2,
+        dcache_line_words: int = 4,
+        dcache_latency: int = 2,
+        dcache_mshrs: int = 2,
+        prefetch_bits: int = 4,
+        store_buffer: int = 4,
     ):
         self.reg_file = RegFile()
-        self.icache = SRAM(32, 0x100000, sram_file)
-        self.dcache = SRAM(32, 0x100000, sram_file)
+        self.main_memory = MainMemory(memory_size, sram_file)
+        self.icache = ICache(verbose, icache_sets, icache_ways, icache_line_words, icache_latency)
+        self.dcache = DCache(
+            verbose,
+            dcache_sets,
+            dcache_ways,
+            dcache_line_words,
+            dcache_latency,
+            dcache_mshrs,
+            prefetch_bits,
+            store_buffer,
+            log_commits=trace_level == TraceLevel.COMMIT,
+        )
+        self.btb = BranchTargetBuffer(btb_bits)
+        self.ras = ReturnAddressStack(ras_depth)
 
         self.fetcher = Fetcher()
         self.fetcher_impl = FetcherImpl(verbose)
-        self.decoder = Decoder(verbose)
+        self.decoder = Decoder(verbose, instrument)
         self.executor = Executor(verbose)
         self.memory = Memory(verbose, self.dcache)
-        self.write_back = WriteBack(verbose)
+        self.write_back = WriteBack(verbose, trace_level)
         self.reg_occupation = RegOccupation(verbose)
         self.bypasser = Bypasser(verbose)
         self.predictor = predictor_fn()
+        self.perf_counter = PerfCounter(verbose, instrument)
 
         self.clocker = Driver()
 
         self._build()
 
     def _build(self):
-        self.clocker.build([self.fetcher, self.decoder])
+        self.clocker.build([self.fetcher, self.decoder], self.write_back.halted)
 
         PC_reg, PC_addr = self.fetcher.build()
-        should_stall, decoder_rd, branch_addr, predict_offset = self.decoder.build(
+        should_stall, jump_info, decoder_rd, branch_addr, predict_offset = self.decoder.build(
             self.icache, self.reg_file, self.reg_occupation, self.executor, self.memory, self.bypasser
         )
-        flush_PC, flush_offset, alu_rd = self.executor.build(self.memory, self.bypasser)
-        mem_rd = self.memory.build(self.write_back)
-        release_rd = self.write_back.build(self.reg_file, self.memory)
+        flush_PC, flush_offset, alu_rd, feedback, exec_addr, mem_probe = self.executor.build(
+            self.memory, self.bypasser, self.btb, self.perf_counter
+        )
+        mem_rd, mem_access = self.memory.build(self.write_back)
+        release_rd, write_back_data, halt = self.write_back.build(self.reg_file, self.memory)
+        (
+            mem_request,
+            dcache_written,
+            dcache_hit,
+            dcache_miss,
+            dcache_defer,
+            store_forward,
+            prefetch,
+            fill_rd,
+            fill_data,
+        ) = self.dcache.build(PC_addr, mem_probe, mem_access, decoder_rd, release_rd, self.main_memory)
 
-        self.reg_occupation.build(decoder_rd, release_rd, flush_PC)
+        self.reg_file.build(PC_addr, release_rd, write_back_data, fill_rd, fill_data)
+        self.reg_occupation.build(PC_addr, decoder_rd, release_rd, flush_PC, fill_rd)
         self.bypasser.build(PC_addr, decoder_rd, alu_rd, mem_rd, flush_PC)
-        branch_predict = self.predictor.build(
-            branch_addr, PredictFeedback(Bits(32)(0), Bool(0), Bool(0)), self.executor
-        )
-        self.fetcher_impl.build(
+        branch_predict = self.predictor.build(branch_addr, feedback, flush_PC, self.executor)
+        miss_addr = self.fetcher_impl.build(
             PC_reg,
             PC_addr,
             should_stall,
+            jump_info,
             flush_PC,
             flush_offset,
             branch_predict,
             predict_offset,
             self.decoder,
+            self.executor,
             self.icache,
+            self.btb,
+            self.ras,
+        )
+        refill_addr, icache_miss = self.icache.build(
+            PC_addr, miss_addr, self.main_memory, mem_request, self.dcache, dcache_written
+        )
+        self.main_memory.build(refill_addr, mem_request)
+        self.perf_counter.build(
+            PC_addr,
+            should_stall,
+            jump_info.change_PC,
+            self.fetcher_impl.stalled,
+            self.fetcher_impl.fetch_missed,
+            self.icache.port_lost,
+            icache_miss,
+            self.dcache.blocked,
+            self.dcache.store_full,
+            dcache_hit,
+            dcache_miss,
+            dcache_defer,
+            store_forward,
+            prefetch,
+            exec_addr,
+            mem_rd,
+            release_rd,
+            halt,
+            feedback,
+            flush_PC,
+            self.bypasser.should_flush,
         )
@@ -0,0 +1,581 @@
+from dataclasses import dataclass
+from math import log2
+from assassyn.frontend import *
+from main_memory import MainMemory, MemoryRequest
+from prefetcher import StridePrefetcher
+from utils import Bool
+
+
+@dataclass
+class MemoryProbe:
+    # 执行阶段算出的访存地址，下一周期该指令进入访存阶段
+    addr: Value
+    is_load: Value
+    rd: Value
+    pc: Value
+
+
+@dataclass
+class PrefetchEvents:
+    issued: Value
+    useful: Value
+    late: Value
+
+
+class DCache(Downstream):
+    verbose: bool
+    log_commits: bool
+
+    sets: int
+    ways: int
+    line_words: int
+    latency: int
+    mshrs: int
+    store_depth: int
+    prefetcher: StridePrefetcher | None
+
+    set_bits: int
+    offset_bits: int
+    way_bits: int
+    tag_bits: int
+    wait_bits: int
+    mshr_bits: int
+    store_bits: int
+
+    clocker: Array
+
+    # 每一路单独一组数组，同一周期可以写不同的路；数据再按行内偏移拆开，装入时一个周期写完整行
+    valid: list[Array]
+    dirty: list[Array]
+    tags: list[Array]
+    data: list[list[Array]]
+    # 距上次访问的时间，饱和于 ways - 1，替换时选最大者
+    ages: list[Array]
+    # 由预取装入、尚未被访问过的行
+    prefetched: list[Array]
+
+    # 访存读出的字，下一周期交给写回
+    dout: Array
+
+    # 无法交给 MSHR 的缺失：访存、执行、译码三级停顿，直至该行装入
+    blocked: Array
+    blocked_line: Array
+    # 本周期进入访存阶段的 load 已交给 MSHR，不写回寄存器
+    deferred: Array
+
+    # 每个 MSHR 记录一条缺失的 load，回填后由缓存直接写回寄存器
+    mshr_valid: list[Array]
+    mshr_addr: list[Array]
+    mshr_rd: list[Array]
+    mshr_pc: list[Array]
+
+    # store 先进入先进先出的 store buffer，在访存阶段不访问缓存的周期写入缓存；0 号为最早的项
+    store_addr: list[Array]
+    store_data: list[Array]
+    store_count: Array
+    # store buffer 可能放不下下一条 store：访存、执行、译码三级停顿，直至有空位
+    store_full: Array
+
+    # 等待发出的预取，只在没有其他缺失需要处理时进行，新的请求覆盖旧的
+    prefetch_valid: Array
+    prefetch_line: Array
+
+    # 回填逐个处理：读入整行 -> 等待空闲周期装入 -> 写回寄存器 / 写回被替换的脏行
+    job_line: Array
+    job_mshr: Array
+    job_blocked: Array
+    job_prefetch: Array
+    job_idx: Array
+    fetching: Array
+    wait: Array
+    issue_idx: Array
+    capture_valid: Array
+    capture_idx: Array
+    fill_buf: Array
+    installing: Array
+    delivering: Array
+    evicting: Array
+    evict_line: Array
+    evict_idx: Array
+    evict_buf: list[Array]
+
+    def __init__(
+        self,
+        verbose: bool,
+        sets: int = 16,
+        ways: int = 2,
+        line_words: int = 4,
+        latency: int = 2,
+        mshrs: int = 2,
+        prefetch_bits: int = 4,
+        store_buffer: int = 4,
+        log_commits: bool = False,
+    ):
+        super().__init__()
+
+        for n in (sets, ways, line_words):
+            assert n > 0 and n & (n - 1) == 0
+        assert sets >= 2 and latency >= 0 and mshrs >= 0 and store_buffer > 0
+
+        self.verbose = verbose
+        self.log_commits = log_commits
+        self.sets = sets
+        self.ways = ways
+        self.line_words = line_words
+        self.latency = latency
+        self.mshrs = mshrs
+        self.store_depth = store_buffer
+        self.prefetcher = StridePrefetcher(prefetch_bits) if prefetch_bits > 0 else None
+
+        self.set_bits = int(log2(sets))
+        self.offset_bits = int(log2(line_words))
+        self.way_bits = max(1, int(log2(ways)))
+        self.tag_bits = 30 - self.offset_bits - self.set_bits
+        assert self.tag_bits > 0
+        self.wait_bits = max(1, latency.bit_length())
+        self.mshr_bits = max(1, (mshrs - 1).bit_length())
+        self.store_bits = store_buffer.bit_length()
+
+        self.clocker = RegArray(Bool, 1)
+        self.valid = [RegArray(Bool, sets) for _ in range(ways)]
+        self.dirty = [RegArray(Bool, sets) for _ in range(ways)]
+        self.tags = [RegArray(Bits(self.tag_bits), sets) for _ in range(ways)]
+        self.data = [[RegArray(Bits(32), sets) for _ in range(line_words)] for _ in range(ways)]
+        self.ages = [RegArray(Bits(self.way_bits), sets) for _ in range(ways)]
+        self.prefetched = [RegArray(Bool, sets) for _ in range(ways)]
+        self.dout = RegArray(Bits(32), 1)
+
+        self.blocked = RegArray(Bool, 1)
+        self.blocked_line = RegArray(Bits(32), 1)
+        self.deferred = RegArray(Bool, 1)
+
+        self.mshr_valid = [RegArray(Bool, 1) for _ in range(mshrs)]
+        self.mshr_addr = [RegArray(Bits(32), 1) for _ in range(mshrs)]
+        self.mshr_rd = [RegArray(Bits(5), 1) for _ in range(mshrs)]
+        self.mshr_pc = [RegArray(Bits(32), 1) for _ in range(mshrs)]
+
+        self.store_addr = [RegArray(Bits(32), 1) for _ in range(store_buffer)]
+        self.store_data = [RegArray(Bits(32), 1) for _ in range(store_buffer)]
+        self.store_count = RegArray(Bits(self.store_bits), 1)
+        self.store_full = RegArray(Bool, 1)
+
+        self.prefetch_valid = RegArray(Bool, 1)
+        self.prefetch_line = RegArray(Bits(32), 1)
+
+        self.job_line = RegArray(Bits(32), 1)
+        self.job_mshr = RegArray(Bool, 1)
+        self.job_blocked = RegArray(Bool, 1)
+        self.job_prefetch = RegArray(Bool, 1)
+        self.job_idx = RegArray(Bits(self.mshr_bits), 1)
+        self.fetching = RegArray(Bool, 1)
+        self.wait = RegArray(Bits(self.wait_bits), 1)
+        self.issue_idx = RegArray(Bits(self.offset_bits + 1), 1)
+        self.capture_valid = RegArray(Bool, 1)
+        self.capture_idx = RegArray(Bits(self.offset_bits + 1), 1)
+        self.fill_buf = RegArray(Bits(32), line_words)
+        self.installing = RegArray(Bool, 1)
+        self.delivering = RegArray(Bool, 1)
+        self.evicting = RegArray(Bool, 1)
+        self.evict_line = RegArray(Bits(32), 1)
+        self.evict_idx = RegArray(Bits(self.offset_bits + 1), 1)
+        self.evict_buf = [RegArray(Bits(32), 1) for _ in range(line_words)]
+
+    def extract_set(self, addr: Value) -> Value:
+        low = 2 + self.offset_bits
+        return addr[low : (low + self.set_bits - 1)]
+
+    def extract_tag(self, addr: Value) -> Value:
+        return addr[(2 + self.offset_bits + self.set_bits) : 31]
+
+    def extract_offset(self, addr: Value) -> Value | None:
+        if self.offset_bits == 0:
+            return None
+        return addr[2 : (self.offset_bits + 1)]
+
+    def line_base(self, addr: Value) -> Value:
+        low = 2 + self.offset_bits
+        return addr[low:31].concat(Bits(low)(0))
+
+    def word_addr(self, line: Value, idx: Value) -> Value:
+        if self.offset_bits == 0:
+            return line
+        low = 2 + self.offset_bits
+        return line[low:31].concat(idx[0 : (self.offset_bits - 1)]).concat(Bits(2)(0))
+
+    def read_data(self, way: int, set_index: Value, offset: Value | None) -> Value:
+        word = self.data[way][0][set_index]
+        for index in range(1, self.line_words):
+            word = (offset == Bits(self.offset_bits)(index)).select(self.data[way][index][set_index], word)
+        return word
+
+    def busy(self) -> Value:
+        return self.blocked[0] | self.store_full[0]
+
+    def outstanding(self) -> Value:
+        pending = self.store_count[0] != Bits(self.store_bits)(0)
+        for valid in self.mshr_valid:
+            pending = pending | valid[0]
+        return pending
+
+    def pending(self, rd: Value) -> Value:
+        """Whether a load waiting in an MSHR will still write rd."""
+        match = Bool(0)
+        for index in range(self.mshrs):
+            match = match | (self.mshr_valid[index][0] & (self.mshr_rd[index][0] == rd))
+        return match & (rd != Bits(5)(0))
+
+    def lookup(self, addr: Value) -> tuple[Value, Value, Value]:
+        """Returns whether addr hits, the way it hits in and the cached word."""
+        set_index = self.extract_set(addr)
+        tag = self.extract_tag(addr)
+        offset = self.extract_offset(addr)
+
+        hit = Bool(0)
+        way_index = Bits(self.way_bits)(0)
+        word = Bits(32)(0)
+        for way in range(self.ways):
+            way_hit = self.valid[way][set_index] & (self.tags[way][set_index] == tag)
+            way_index = way_hit.select(Bits(self.way_bits)(way), way_index)
+            word = way_hit.select(self.read_data(way, set_index, offset), word)
+            hit = hit | way_hit
+        return hit, way_index, word
+
+    def buffered(self, addr: Value) -> tuple[Value, Value]:
+        """Returns whether the store buffer holds the word at addr and its youngest value."""
+        match = Bool(0)
+        word = Bits(32)(0)
+        for index in range(self.store_depth):
+            entry = (self.store_count[0] > Bits(self.store_bits)(index)) & (
+                self.store_addr[index][0][2:31] == addr[2:31]
+            )
+            word = entry.select(self.store_data[index][0], word)
+            match = match | entry
+        return match, word
+
+    def touch(self, set_index: Value, way_index: Value):
+        if self.ways == 1:
+            return
+        oldest = Bits(self.way_bits)(self.ways - 1)
+        for way in range(self.ways):
+            age = self.ages[way][set_index]
+            self.ages[way][set_index] = (way_index == Bits(self.way_bits)(way)).select(
+                Bits(self.way_bits)(0), (age == oldest).select(age, age + Bits(self.way_bits)(1))
+            )
+
+    def select_victim(self, set_index: Value) -> Value:
+        # 优先替换无效的路，否则替换最久未访问的路
+        victim = Bits(self.way_bits)(0)
+        victim_age = self.ages[0][set_index]
+        for way in range(1, self.ways):
+            older = self.ages[way][set_index] > victim_age
+            victim = older.select(Bits(self.way_bits)(way), victim)
+            victim_age = older.select(self.ages[way][set_index], victim_age)
+
+        found_invalid = Bool(0)
+        for way in range(self.ways):
+            take = ~found_invalid & ~self.valid[way][set_index]
+            victim = take.select(Bits(self.way_bits)(way), victim)
+            found_invalid = found_invalid | take
+        return victim
+
+    @downstream.combinational
+    def build(
+        self,
+        clocker: Value,
+        probe: MemoryProbe,
+        access: MemoryRequest,
+        decoder_rd: Value,
+        release_rd: Value,
+        main_memory: MainMemory,
+    ):
+        self.clocker[0] = clocker[0:0]
+
+        line_end = Bits(self.offset_bits + 1)(self.line_words)
+
+        # 执行阶段算出访存地址时查找；缺失的 load 尽量交给空闲的 MSHR，其余缺失从下一周期起停顿流水线
+        is_memory = probe.addr.valid()
+        probe_addr = probe.addr.optional(Bits(32)(0))
+        probe_line = self.line_base(probe_addr)
+        probe_rd = probe.rd.optional(Bits(5)(0))
+        is_load = probe.is_load.optional(Bool(0))
+        lookup_hit, lookup_way, _ = self.lookup(probe_addr)
+
+        # 与 store buffer 中（含本周期访存阶段进入的）store 同一字的 load 由 store buffer 转发，不论缓存是否命中
+        store = access.we.optional(Bool(0))
+        addr = access.addr.optional(Bits(32)(0))
+        buffered, _ = self.buffered(probe_addr)
+        forward = is_memory & is_load & (buffered | (store & (addr[2:31] == probe_addr[2:31])))
+        hit = is_memory & (lookup_hit | forward)
+        miss = is_memory & ~lookup_hit & ~forward
+
+        # 预取的行第一次被访问时计为有用；预取已发出但尚未装入时的缺失计为过晚
+        probe_set = self.extract_set(probe_addr)
+        prefetch_useful = Bool(0)
+        cached = is_memory & lookup_hit
+        for way in range(self.ways):
+            first_use = cached & (lookup_way == Bits(self.way_bits)(way)) & self.prefetched[way][probe_set]
+            with Condition(first_use):
+                self.prefetched[way][probe_set] = Bool(0)
+            prefetch_useful = prefetch_useful | first_use
+        prefetch_late = (
+            miss
+            & self.job_prefetch[0]
+            & (self.fetching[0] | self.installing[0])
+            & (self.job_line[0] == probe_line)
+        )
+
+        prefetch_request = Bool(0)
+        if self.prefetcher is not None:
+            with Condition(is_memory & is_load):
+                issue, target = self.prefetcher.observe(probe.pc, probe_addr, 4 * self.line_words)
+                target_present, _, _ = self.lookup(target)
+                prefetch_request = issue & ~target_present
+            prefetch_request = prefetch_request.optional(Bool(0))
+            with Condition(prefetch_request):
+                self.prefetch_valid[0] = Bool(1)
+                self.prefetch_line[0] = self.line_base(target)
+
+        free_found = Bool(0)
+        free_idx = Bits(self.mshr_bits)(0)
+        for index in range(self.mshrs):
+            mshr_valid = self.mshr_valid[index][0]
+            take = ~free_found & ~mshr_valid
+            free_idx = take.select(Bits(self.mshr_bits)(index), free_idx)
+            free_found = free_found | take
+
+        # 同周期译码的指令写同一寄存器时不能推迟，否则回填会覆盖更新的值
+        rd_conflict = self.pending(probe_rd) | (
+            (probe_rd != Bits(5)(0)) & (decoder_rd.optional(Bits(5)(0)) == probe_rd)
+        )
+        allocate = miss & is_load & free_found & ~rd_conflict
+        block = miss & is_load & ~allocate
+        self.deferred[0] = allocate
+
+        for index in range(self.mshrs):
+            with Condition(allocate & (free_idx == Bits(self.mshr_bits)(index))):
+                self.mshr_valid[index][0] = Bool(1)
+                self.mshr_addr[index][0] = probe_addr
+                self.mshr_rd[index][0] = probe_rd
+                self.mshr_pc[index][0] = probe.pc
+
+        with Condition(block):
+            self.blocked[0] = Bool(1)
+            self.blocked_line[0] = probe_line
+
+        # store 只在下一周期 store buffer 必有空位时进入访存阶段：本周期访存阶段的 store 可能再占一项
+        count = self.store_count[0]
+        depth = Bits(self.store_bits)(self.store_depth)
+        full_next = (count == depth) | (store & (count == Bits(self.store_bits)(self.store_depth - 1)))
+        with Condition(is_memory & ~is_load & full_next):
+            self.store_full[0] = Bool(1)
+        with Condition(self.store_full[0] & (count != depth)):
+            self.store_full[0] = Bool(0)
+
+        # 访存阶段：流水线未停顿且 load 未交给 MSHR 时运行，所读的字在 store buffer 或缓存中
+        load = access.re.optional(Bool(0))
+        access_hit, access_way, access_word = self.lookup(addr)
+        forwarded, forward_word = self.buffered(addr)
+        with Condition(load & access_hit):
+            self.touch(self.extract_set(addr), access_way)
+        with Condition(load):
+            self.dout[0] = forwarded.select(forward_word, access_word)
+
+        # 队首的行已缓存、没有 MSHR 等待该行且访存阶段不读缓存时，队首写入缓存
+        head_addr = self.store_addr[0][0]
+        head_line = self.line_base(head_addr)
+        head_set = self.extract_set(head_addr)
+        head_offset = self.extract_offset(head_addr)
+        head_hit, head_way, _ = self.lookup(head_addr)
+        head_pending = Bool(0)
+        for index in range(self.mshrs):
+            head_pending = head_pending | (
+                self.mshr_valid[index][0] & (self.line_base(self.mshr_addr[index][0]) == head_line)
+            )
+        has_store = count != Bits(self.store_bits)(0)
+        drain = has_store & head_hit & ~head_pending & ~load
+        with Condition(drain):
+            self.touch(head_set, head_way)
+            written = head_addr | head_addr
+        for way in range(self.ways):
+            for index in range(self.line_words):
+                cond = drain & (head_way == Bits(self.way_bits)(way))
+                if self.offset_bits > 0:
+                    cond = cond & (head_offset == Bits(self.offset_bits)(index))
+                with Condition(cond):
+                    self.data[way][index][head_set] = self.store_data[0][0]
+                    self.dirty[way][head_set] = Bool(1)
+
+        # 写入缓存时整体前移一项，访存阶段的 store 放在队尾
+        wdata = access.wdata.optional(Bits(32)(0))
+        push_idx = drain.select(count - Bits(self.store_bits)(1), count)
+        for index in range(self.store_depth):
+            push = store & (push_idx == Bits(self.store_bits)(index))
+            last = index + 1 == self.store_depth
+            with Condition(drain | push):
+                self.store_addr[index][0] = push.select(addr, addr if last else self.store_addr[index + 1][0])
+                self.store_data[index][0] = push.select(wdata, wdata if last else self.store_data[index + 1][0])
+        self.store_count[0] = (store & ~drain).select(
+            count + Bits(self.store_bits)(1), (drain & ~store).select(count - Bits(self.store_bits)(1), count)
+        )
+
+        # 空闲时先处理 MSHR，全部完成后再处理停顿流水线的缺失，然后是 store buffer 队首的缺失，最后才是预取
+        fetching = self.fetching[0]
+        installing = self.installing[0]
+        delivering = self.delivering[0]
+        evicting = self.evicting[0]
+        idle = ~fetching & ~installing & ~delivering & ~evicting
+
+        has_mshr = Bool(0)
+        first_idx = Bits(self.mshr_bits)(0)
+        first_addr = Bits(32)(0)
+        for index in reversed(range(self.mshrs)):
+            first_idx = self.mshr_valid[index][0].select(Bits(self.mshr_bits)(index), first_idx)
+            first_addr = self.mshr_valid[index][0].select(self.mshr_addr[index][0], first_addr)
+            has_mshr = has_mshr | self.mshr_valid[index][0]
+
+        store_miss = has_store & ~head_hit
+        start = idle & (has_mshr | self.blocked[0] | store_miss | self.prefetch_valid[0])
+        start_blocked = ~has_mshr & self.blocked[0]
+        start_prefetch = ~has_mshr & ~self.blocked[0] & ~store_miss
+        start_line = has_mshr.select(
+            self.line_base(first_addr),
+            self.blocked[0].select(self.blocked_line[0], store_miss.select(head_line, self.prefetch_line[0])),
+        )
+        present, _, _ = self.lookup(start_line)
+        prefetch_issued = start & start_prefetch & ~present
+        with Condition(start & start_prefetch & ~prefetch_request):
+            self.prefetch_valid[0] = Bool(0)
+        with Condition(start):
+            self.job_line[0] = start_line
+            self.job_mshr[0] = has_mshr
+            self.job_blocked[0] = start_blocked
+            self.job_prefetch[0] = start_prefetch
+            self.job_idx[0] = first_idx
+            self.fetching[0] = ~present
+            self.delivering[0] = present & has_mshr
+            self.wait[0] = Bits(self.wait_bits)(self.latency)
+            self.issue_idx[0] = Bits(self.offset_bits + 1)(0)
+
+        # 等待 latency 个周期，再逐字把整行读入缓冲区
+        job_line = self.job_line[0]
+        issue_idx = self.issue_idx[0]
+        waiting = self.wait[0] != Bits(self.wait_bits)(0)
+        with Condition(fetching & waiting):
+            self.wait[0] = self.wait[0] - Bits(self.wait_bits)(1)
+
+        read_word = fetching & ~waiting & (issue_idx != line_end)
+        self.capture_valid[0] = read_word
+        with Condition(read_word):
+            self.issue_idx[0] = issue_idx + Bits(self.offset_bits + 1)(1)
+            self.capture_idx[0] = issue_idx
+
+        with Condition(self.capture_valid[0]):
+            self.fill_buf[self.capture_idx[0][0 : max(self.offset_bits - 1, 0)]] = main_memory.get_out()
+
+        with Condition(fetching & (issue_idx == line_end) & ~self.capture_valid[0]):
+            self.fetching[0] = Bool(0)
+            self.installing[0] = Bool(1)
+
+        # 装入会改写替换的路，只在执行、访存两级都不访问缓存且 store buffer 不写缓存的周期进行
+        install = installing & ~is_memory & ~load & ~drain
+        job_set = self.extract_set(job_line)
+        with Condition(install):
+            victim = self.select_victim(job_set)
+            victim_dirty = Bool(0)
+            victim_tag = Bits(self.tag_bits)(0)
+            for way in range(self.ways):
+                is_victim = victim == Bits(self.way_bits)(way)
+                victim_dirty = victim_dirty | (is_victim & self.valid[way][job_set] & self.dirty[way][job_set])
+                victim_tag = is_victim.select(self.tags[way][job_set], victim_tag)
+                with Condition(is_victim):
+                    self.valid[way][job_set] = Bool(1)
+                    self.dirty[way][job_set] = Bool(0)
+                    self.tags[way][job_set] = self.extract_tag(job_line)
+                    self.prefetched[way][job_set] = self.job_prefetch[0]
+                    for index in range(self.line_words):
+                        self.data[way][index][job_set] = self.fill_buf[index]
+            self.touch(job_set, victim)
+
+            for index in range(self.line_words):
+                victim_word = Bits(32)(0)
+                for way in range(self.ways):
+                    victim_word = (victim == Bits(self.way_bits)(way)).select(
+                        self.data[way][index][job_set], victim_word
+                    )
+                self.evict_buf[index][0] = victim_word
+            self.evicting[0] = victim_dirty
+            self.evict_line[0] = victim_tag.concat(job_set).concat(Bits(2 + self.offset_bits)(0))
+            self.evict_idx[0] = Bits(self.offset_bits + 1)(0)
+
+            self.installing[0] = Bool(0)
+            self.delivering[0] = self.job_mshr[0]
+
+        blocked_done = (start & present & start_blocked) | (install & self.job_blocked[0])
+        with Condition(blocked_done):
+            self.blocked[0] = Bool(0)
+
+        # 写回级本周期不写寄存器时，把 MSHR 等待的字写回
+        job_idx = self.job_idx[0]
+        deliver_addr = Bits(32)(0)
+        deliver_rd = Bits(5)(0)
+        deliver_pc = Bits(32)(0)
+        for index in range(self.mshrs):
+            is_job = job_idx == Bits(self.mshr_bits)(index)
+            deliver_addr = is_job.select(self.mshr_addr[index][0], deliver_addr)
+            deliver_rd = is_job.select(self.mshr_rd[index][0], deliver_rd)
+            deliver_pc = is_job.select(self.mshr_pc[index][0], deliver_pc)
+        _, _, deliver_word = self.lookup(deliver_addr)
+
+        deliver = delivering & (release_rd.optional(Bits(5)(0)) == Bits(5)(0))
+        with Condition(deliver):
+            self.delivering[0] = Bool(0)
+            for index in range(self.mshrs):
+                with Condition(job_idx == Bits(self.mshr_bits)(index)):
+                    self.mshr_valid[index][0] = Bool(0)
+            fill_rd = deliver_rd | deliver_rd
+            fill_data = deliver_word | deliver_word
+            if self.log_commits:
+                with Condition(deliver_rd != Bits(5)(0)):
+                    log("fill pc=0x{:08X} x{}=0x{:08X}", deliver_pc, deliver_rd, deliver_word)
+
+        # 被替换的脏行逐字写回，完成前不开始下一次回填
+        evict_idx = self.evict_idx[0]
+        evict_word = self.evict_buf[0][0]
+        for index in range(1, self.line_words):
+            evict_word = (evict_idx == Bits(self.offset_bits + 1)(index)).select(self.evict_buf[index][0], evict_word)
+        write_word = evicting & (evict_idx != line_end)
+        with Condition(write_word):
+            self.evict_idx[0] = evict_idx + Bits(self.offset_bits + 1)(1)
+        with Condition(evicting & (evict_idx == line_end)):
+            self.evicting[0] = Bool(0)
+
+        # 缓存独占存储器的数据端口，I-cache 回填只能使用空闲的周期
+        request = MemoryRequest(
+            write_word,
+            read_word,
+            write_word.select(self.word_addr(self.evict_line[0], evict_idx), self.word_addr(job_line, issue_idx)),
+            evict_word,
+        )
+
+        if self.verbose:
+            log(
+                "dcache hit: {}, allocate: {}, block: {}, stores: {}, drain: {}, prefetch: ({}, 0x{:08X}), start: {}, line: 0x{:08X}, fetching: {}, wait: {}, issue: {}, install: {}, deliver: {}, evicting: {}",
+                hit,
+                allocate,
+                block,
+                count,
+                drain,
+                self.prefetch_valid[0],
+                self.prefetch_line[0],
+                start,
+                job_line,
+                fetching,
+                self.wait[0],
+                issue_idx,
+                install,
+                deliver,
+                evicting,
+            )
+
+        prefetch = PrefetchEvents(prefetch_issued, prefetch_useful, prefetch_late)
+        return request, written, hit, miss, allocate, forward, prefetch, fill_rd, fill_data
@@ -1,25 +1,41 @@
+from dataclasses import dataclass
 from assassyn.frontend import *
 from bypass import Bypasser
 from executor import Executor
+from icache import ICache
 from memory import Memory
 from reg_file import RegFile, RegOccupation
 from instruction import Instructions, default_instruction_arguments
 from utils import Bool
 
 
+@dataclass
+class JumpInfo:
+    change_PC: Value
+    is_jal: Value
+    push_return: Value
+    pop_return: Value
+
+
+def is_link_reg(reg: Value) -> Value:
+    return (reg == Bits(5)(1)) | (reg == Bits(5)(5))
+
+
 class Decoder(Module):
     verbose: bool
+    instrument: bool
 
     instruction_addr: Port
 
-    def __init__(self, verbose: bool):
+    def __init__(self, verbose: bool, instrument: bool = False):
         super().__init__(ports={"instruction_addr": Port(Bits(32))})
         self.verbose = verbose
+        self.instrument = instrument
 
     @module.combinational
     def build(
         self,
-        icache: SRAM,
+        icache: ICache,
         reg_file: RegFile,
         reg_occupation: RegOccupation,
         executor: Executor,
@@ -47,7 +63,22 @@ class Decoder(Module):
 
         is_rs1_valid = is_rs_valid(args.rs1.value)
         is_rs2_valid = is_rs_valid(args.rs2.value)
-        wait_until(is_rs1_valid & is_rs2_valid)
+
+        if self.instrument:
+            with Condition(~(is_rs1_valid & is_rs2_valid)):
+                log(
+                    "hazard addr=0x{:08X} rs1=({}, x{}) rs2=({}, x{})",
+                    instruction_addr,
+                    ~is_rs1_valid,
+                    args.rs1.value,
+                    ~is_rs2_valid,
+                    args.rs2.value,
+                )
+
+        # MSHR 中的 load 回填时才写 rd，之后的指令不能先写同一寄存器
+        waw = args.rd.valid & memory.dcache.pending(args.rd.value)
+
+        wait_until(is_rs1_valid & is_rs2_valid & ~waw & ~memory.dcache.busy())
 
         def rs_selector(rs: Value):
             is_x0 = rs == Bits(5)(0)
@@ -68,13 +99,15 @@ class Decoder(Module):
         with Condition(args.rs2.valid):
             executor.bind(rs2=rs2_data)
 
-        args.bind_with(executor, ["rs1", "rs2", "just_stall"])
+        args.bind_with(executor, ["rs1", "rs2", "is_jal"])
         executor.async_called(instruction_addr=instruction_addr)
 
         should_stall = args.change_PC.value | args.just_stall.value
 
         with Condition(args.is_branch.value):
             branch_addr = instruction_addr & instruction_addr
+
+        with Condition(args.is_branch.value | args.is_jal.value):
             predict_offset = args.imm.value & args.imm.value
 
         if self.verbose:
@@ -92,4 +125,12 @@ class Decoder(Module):
                 rs2_data,
             )
 
-        return should_stall, args.rd.value, branch_addr, predict_offset
+        # 按 RISC-V 约定，写 x1/x5 的跳转视为调用，从 x1/x5 跳转且不链接的 JALR 视为返回
+        jump_info = JumpInfo(
+            change_PC=args.change_PC.value,
+            is_jal=args.is_jal.value,
+            push_return=(args.change_PC.value | args.is_jal.value) & args.rd.valid & is_link_reg(args.rd.value),
+            pop_return=args.is_jalr.value & is_link_reg(args.rs1.value) & (args.rd.value == Bits(5)(0)),
+        )
+
+        return should_stall, jump_info, args.rd.value, branch_addr, predict_offset
@@ -1,7 +1,11 @@
 from alu import ALU_LEN, BITS_ALU, alu
 from assassyn.frontend import *
+from btb import BranchTargetBuffer
 from bypass import Bypasser
-from instruction import MO_LEN, OF_LEN, OperantFrom
+from dcache import MemoryProbe
+from instruction import MO_LEN, OF_LEN, MemoryOperation, OperantFrom
+from perf_counter import PerfCounter
+from predictor import PredictFeedback
 from utils import Bool, flush_all_ports, forward_ports, peek_or, pop_or, to_one_hot
 
 
@@ -22,7 +26,9 @@ class Executor(Module):
     branch_flip: Port
     change_PC: Port
     is_jalr: Port
+    just_stall: Port
     branch_predict: Port
+    predict_PC: Port
 
     alu_out: Array
 
@@ -42,14 +48,19 @@ class Executor(Module):
                 "branch_flip": Port(Bool),
                 "change_PC": Port(Bool),
                 "is_jalr": Port(Bool),
+                "just_stall": Port(Bool),
                 "branch_predict": Port(Bool),
+                "predict_PC": Port(Bits(32)),
             }
         )
         self.verbose = verbose
         self.alu_out = RegArray(Bits(32), 1)
 
     @module.combinational
-    def build(self, memory: Module, bypasser: Bypasser):
+    def build(self, memory: Module, bypasser: Bypasser, btb: BranchTargetBuffer, perf_counter: PerfCounter):
+        # D-cache 缺失时访存阶段停顿，不能再向其发送指令
+        wait_until(~memory.dcache.busy())
+
         bypass_flush_condition = bypasser.should_flush[0]
         with Condition(bypass_flush_condition):
             flush_all_ports(self)
@@ -67,7 +78,8 @@ class Executor(Module):
 
             one_hot_operant1_from = to_one_hot(operant1_from, len(OperantFrom))
             one_hot_operant2_from = to_one_hot(operant2_from, len(OperantFrom))
-            operants = [rs1, rs2, imm, instruction_addr, Bits(32)(4)]
+            csr = perf_counter.read_csr(imm[0:11])
+            operants = [rs1, rs2, imm, instruction_addr, Bits(32)(4), csr]
             operant1 = one_hot_operant1_from.select1hot(*operants)
             operant2 = one_hot_operant2_from.select1hot(*operants)
             alu_result = alu(to_one_hot(alu_op, ALU_LEN), operant1, operant2)
@@ -92,19 +104,43 @@ class Executor(Module):
             with Condition(~self.memory_operation.valid()):
                 rd = peek_or(self.rd, Bits(5)(0))
 
+            with Condition(self.memory_operation.valid()):
+                probe = MemoryProbe(
+                    alu_result | alu_result,
+                    self.memory_operation.peek() <= Bits(MO_LEN)(MemoryOperation.LOAD_HALFU.value),
+                    peek_or(self.rd, Bits(5)(0)),
+                    instruction_addr | instruction_addr,
+                )
+
             is_branch = pop_or(self.is_branch, Bool(0))
             branch_flip = pop_or(self.branch_flip, Bool(0))
             change_PC = pop_or(self.change_PC, Bool(0))
             is_jalr = pop_or(self.is_jalr, Bool(0))
             branch_predict = pop_or(self.branch_predict, Bool(0))
+            jump_predicted = self.predict_PC.valid()
+            predict_PC = pop_or(self.predict_PC, Bits(32)(0))
 
             branch_success = (alu_result != Bits(32)(0)) ^ branch_flip
             mis_predict = is_branch & (branch_predict ^ branch_success)
-            with Condition(mis_predict | change_PC):
+
+            # 取指阶段若已通过 BTB 跳到正确目标，则无需冲刷
+            jump_target = is_jalr.select(rs1, instruction_addr) + imm
+            mis_jump = change_PC & ~(jump_predicted & (predict_PC == jump_target))
+            with Condition(mis_jump):
+                btb.update(instruction_addr, jump_target)
+
+            with Condition(mis_predict | mis_jump):
                 flush_PC = is_jalr.select(rs1, instruction_addr)
 
                 branch_offset = (change_PC | branch_success).select(imm, Bits(32)(4))
 
+            with Condition(is_branch):
+                feedback = PredictFeedback(
+                    instruction_addr & instruction_addr,
+                    branch_predict & branch_predict,
+                    branch_success & branch_success,
+                )
+
             forward_ports(
                 memory,
                 [
@@ -113,12 +149,13 @@ class Executor(Module):
                     self.rs1,
                     self.rs2,
                     self.memory_operation,
+                    self.just_stall,
                 ],
             )
 
             memory.async_called()
 
-        return flush_PC, branch_offset, rd
+        return flush_PC, branch_offset, rd, feedback, instruction_addr, probe
 
     def get_out(self) -> Value:
         return self.alu_out[0]
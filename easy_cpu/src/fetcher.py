@@ -1,5 +1,8 @@
 from assassyn.frontend import *
-from decoder import Decoder
+from btb import BranchTargetBuffer
+from decoder import Decoder, JumpInfo
+from icache import ICache
+from ras import ReturnAddressStack
 from utils import Bool
 
 
@@ -19,10 +22,13 @@ class FetcherImpl(Downstream):
     verbose: bool
 
     stalled: Array
+    # 上一周期取指未命中 I-cache，本该取到的指令需要重新读取
+    fetch_missed: Array
 
     def __init__(self, verbose: bool):
         super().__init__()
         self.stalled = RegArray(Bool, 1)
+        self.fetch_missed = RegArray(Bool, 1)
         self.verbose = verbose
 
     # 设计接口时需要小心：如果它的上游均没有运行（即均触发了 wait_until），则下游根本不会运行；并且只会检查 Value 所在的上游，不会检查 array 所在的上游
@@ -32,32 +38,52 @@ class FetcherImpl(Downstream):
         PC_reg: Array,
         PC_addr: Value,
         should_stall: Value,
+        jump_info: JumpInfo,
         flush_PC: Value,
         flush_offset: Value,
         branch_predict: Value,
         predict_offset: Value,
         decoder: Decoder,
-        icache: SRAM,
+        executor: Module,
+        icache: ICache,
+        btb: BranchTargetBuffer,
+        ras: ReturnAddressStack,
     ):
         success_decode = should_stall.valid()
-        should_stall = should_stall.optional(Bool(0))
-        should_branch = branch_predict.optional(Bool(0))
+        change_PC = success_decode & jump_info.change_PC.optional(Bool(0))
+        is_jal = success_decode & jump_info.is_jal.optional(Bool(0))
+        push_return = success_decode & jump_info.push_return.optional(Bool(0))
+        pop_return = success_decode & jump_info.pop_return.optional(Bool(0))
+
+        # 跳转指令命中 BTB 或为函数返回时直接取预测目标处的指令，不再停顿等待执行阶段
+        btb_hit, btb_target = btb.lookup(PC_addr)
+        use_predict = change_PC & (btb_hit | pop_return)
+        jump_target = pop_return.select(ras.peek(), btb_target)
+        should_stall = should_stall.optional(Bool(0)) & ~use_predict
+        should_branch = branch_predict.optional(Bool(0)) | is_jal
 
         cancel_stall = flush_PC.valid() | flush_offset.valid()
 
         added_PC = flush_PC.optional(PC_addr) + flush_offset.optional(should_branch.select(predict_offset, Bits(32)(4)))
+        added_PC = (use_predict & ~cancel_stall).select(jump_target, added_PC)
 
         new_stalled = (self.stalled[0] | should_stall) & ~cancel_stall
 
         new_PC = (cancel_stall | (~new_stalled & success_decode)).select(added_PC, PC_addr)
 
-        icache.build(we=Bool(0), re=Bool(1), addr=new_PC[2:31].zext(Bits(32)), wdata=Bits(32)(0))
+        # 未命中时不交给译码器，下一周期译码器空闲，PC_addr 即为需要重新读取的地址
+        fetch_hit = icache.fetch(new_PC)
+        fetch_missed = ~new_stalled & ~fetch_hit
         PC_reg[0] = new_PC
         self.stalled[0] = new_stalled
+        self.fetch_missed[0] = fetch_missed
+
+        # 与冲刷同周期译码的指令处于错误路径上，不更新返回地址栈
+        ras.build(push_return & ~cancel_stall, pop_return & ~cancel_stall, PC_addr + Bits(32)(4))
 
         if self.verbose:
             log(
-                "new_PC: 0x{:08X}, old_PC: 0x{:08X}, flush_PC: ({}, 0x{:08X}), flush_offset: ({}, 0x{:08X}), should_branch: {}, predict_offset: ({}, 0x{:08X}), success_decode: {}, new_stalled: {}",
+                "new_PC: 0x{:08X}, old_PC: 0x{:08X}, flush_PC: ({}, 0x{:08X}), flush_offset: ({}, 0x{:08X}), should_branch: {}, predict_offset: ({}, 0x{:08X}), jump_predict: ({}, 0x{:08X}), success_decode: {}, new_stalled: {}, fetch_hit: {}",
                 new_PC,
                 PC_addr,
                 flush_PC.valid(),
@@ -67,9 +93,20 @@ class FetcherImpl(Downstream):
                 should_branch,
                 predict_offset.valid(),
                 predict_offset.optional(Bits(32)(0)),
+                use_predict,
+                jump_target,
                 success_decode,
                 new_stalled,
+                fetch_hit,
             )
 
-        with Condition(~new_stalled):
+        with Condition(use_predict):
+            executor.bind(predict_PC=jump_target)
+
+        with Condition(~new_stalled & fetch_hit):
             decoder.bind(instruction_addr=new_PC)
+
+        with Condition(fetch_missed):
+            miss_addr = new_PC | new_PC
+
+        return miss_addr
@@ -0,0 +1,283 @@
+import argparse
+import os
+import random
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Callable
+
+from config import CPUConfig
+from instruction import (
+    BTypeInstruction,
+    Instructions,
+    ITypeInstruction,
+    JTypeInstruction,
+    MemoryOperation,
+    RTypeInstruction,
+    STypeInstruction,
+    UTypeInstruction,
+)
+from iss import ISS, compare_commits
+from perf_counter import PerfEvent
+from simulator import build_config, parse_commits, run_image
+from write_back import TraceLevel
+
+NOP = 0x00000013
+# 访存指令的基址寄存器，程序不会改写它
+BASE_REG = 31
+# 位于默认 64 KiB 存储器内，远离代码与栈
+DATA_BASE = 0x8000
+
+ALU_KINDS = [
+    kind
+    for kind in Instructions
+    if isinstance(kind.value, (RTypeInstruction, UTypeInstruction))
+    or (isinstance(kind.value, ITypeInstruction) and kind.value.opcode == 0b0010011)
+]
+LOAD_KINDS = [Instructions.LB, Instructions.LH, Instructions.LW, Instructions.LBU, Instructions.LHU]
+STORE_KINDS = [Instructions.SB, Instructions.SH, Instructions.SW]
+BRANCH_KINDS = [kind for kind in Instructions if isinstance(kind.value, BTypeInstruction)]
+WORD_KINDS = [Instructions.LW, Instructions.SW]
+
+ACCESS_SIZE = {
+    MemoryOperation.LOAD_BYTE: 1,
+    MemoryOperation.LOAD_BYTEU: 1,
+    MemoryOperation.LOAD_HALF: 2,
+    MemoryOperation.LOAD_HALFU: 2,
+    MemoryOperation.STORE_BYTE: 1,
+    MemoryOperation.STORE_HALF: 2,
+}
+
+
+def encode(kind: Instructions, rd: int = 0, rs1: int = 0, rs2: int = 0, imm: int = 0) -> int:
+    instruction = kind.value
+    word = instruction.opcode
+    if instruction.funct3 is not None:
+        word |= instruction.funct3 << 12
+
+    if isinstance(instruction, RTypeInstruction):
+        return word | (instruction.funct7 << 25) | (rs2 << 20) | (rs1 << 15) | (rd << 7)
+    if isinstance(instruction, ITypeInstruction):
+        if instruction.funct7 is not None:
+            imm = (imm & 0x1F) | (instruction.funct7 << 5)
+        return word | ((imm & 0xFFF) << 20) | (rs1 << 15) | (rd << 7)
+    if isinstance(instruction, STypeInstruction):
+        return word | (((imm >> 5) & 0x7F) << 25) | (rs2 << 20) | (rs1 << 15) | ((imm & 0x1F) << 7)
+    if isinstance(instruction, BTypeInstruction):
+        word |= ((imm >> 12) & 1) << 31 | ((imm >> 5) & 0x3F) << 25 | ((imm >> 1) & 0xF) << 8 | ((imm >> 11) & 1) << 7
+        return word | (rs2 << 20) | (rs1 << 15)
+    if isinstance(instruction, UTypeInstruction):
+        return word | (imm & 0xFFFFF000) | (rd << 7)
+    if isinstance(instruction, JTypeInstruction):
+        word |= ((imm >> 20) & 1) << 31 | ((imm >> 1) & 0x3FF) << 21 | ((imm >> 11) & 1) << 20
+        return word | (((imm >> 12) & 0xFF) << 12) | (rd << 7)
+    raise ValueError(f"Can't encode {kind}")
+
+
+class ProgramGenerator:
+    """Emits hazard-dense, forward-only RV32I programs that always reach EBREAK."""
+
+    rng: random.Random
+    length: int
+    word_only: bool
+
+    program: list[int]
+    recent: list[int]
+    # 已生成的跳转指令的目标下标
+    targets: set[int]
+
+    def __init__(self, rng: random.Random, length: int, word_only: bool = True):
+        self.rng = rng
+        self.length = length
+        self.word_only = word_only
+        self.program = []
+        self.recent = []
+        self.targets = set()
+
+    def pick_rd(self) -> int:
+        # 多数情况下复用最近写过的寄存器，制造连续的 RAW / WAW
+        if self.recent and self.rng.random() < 0.5:
+            return self.rng.choice(self.recent)
+        return self.rng.randrange(1, BASE_REG)
+
+    def pick_rs(self) -> int:
+        if self.recent and self.rng.random() < 0.8:
+            return self.rng.choice(self.recent[-3:])
+        return self.rng.randrange(0, BASE_REG)
+
+    def emit(self, word: int, rd: int = 0):
+        self.program.append(word)
+        if rd:
+            self.recent = (self.recent + [rd])[-8:]
+
+    def remaining(self) -> int:
+        return self.length - len(self.program)
+
+    def forward_offset(self) -> int:
+        # 只向前跳，且不越过结尾的 EBREAK
+        offset = self.rng.randint(1, max(1, min(8, self.remaining() - 1)))
+        self.targets.add(len(self.program) + offset)
+        return 4 * offset
+
+    def emit_alu(self):
+        kind = self.rng.choice(ALU_KINDS)
+        rd = self.pick_rd()
+        imm = self.rng.choice([0, 1, -1, 0x7FF, -0x800, self.rng.randrange(-0x800, 0x800)])
+        if isinstance(kind.value, UTypeInstruction):
+            imm = self.rng.getrandbits(32)
+        self.emit(encode(kind, rd, self.pick_rs(), self.pick_rs(), imm), rd)
+
+    def emit_load(self) -> int:
+        kind = self.rng.choice(WORD_KINDS[:1] if self.word_only else LOAD_KINDS)
+        size = ACCESS_SIZE.get(kind.value.memory_operation, 4)
+        rd = self.pick_rd()
+        self.emit(encode(kind, rd, BASE_REG, imm=size * self.rng.randrange(0, 64 // size)), rd)
+        return rd
+
+    def emit_store(self):
+        kind = self.rng.choice(WORD_KINDS[1:] if self.word_only else STORE_KINDS)
+        size = ACCESS_SIZE.get(kind.value.memory_operation, 4)
+        self.emit(encode(kind, rs1=BASE_REG, rs2=self.pick_rs(), imm=size * self.rng.randrange(0, 64 // size)))
+
+    def emit_branch(self, rs1: int | None = None):
+        kind = self.rng.choice(BRANCH_KINDS)
+        rs1 = self.pick_rs() if rs1 is None else rs1
+        self.emit(encode(kind, rs1=rs1, rs2=self.pick_rs(), imm=self.forward_offset()))
+
+    def emit_jal(self):
+        rd = self.rng.choice([0, 1, self.pick_rd()])
+        self.emit(encode(Instructions.JAL, rd, imm=self.forward_offset()), rd)
+
+    def emit_jalr(self):
+        # auipc 取得当前 pc，jalr 以它为基址向前跳转；跳过 auipc 直接落到 jalr 上会跳到任意地址
+        if len(self.program) + 1 in self.targets:
+            self.emit_alu()
+            return
+        link = self.pick_rd()
+        self.emit(encode(Instructions.AUIPC, link, imm=0), link)
+        rd = self.rng.choice([0, 1, 5, self.pick_rd()])
+        self.emit(encode(Instructions.JALR, rd, link, imm=4 + self.forward_offset()), rd)
+
+    def emit_csr(self):
+        rd = self.pick_rd()
+        csr = self.rng.choice(list(PerfEvent)).value
+        self.emit(encode(Instructions.CSRRS, rd, imm=csr), rd)
+
+    def generate(self) -> list[int]:
+        self.emit(encode(Instructions.LUI, BASE_REG, imm=DATA_BASE))
+        while self.remaining() > 2:
+            choice = self.rng.random()
+            if choice < 0.40:
+                self.emit_alu()
+            elif choice < 0.55:
+                self.emit_store()
+            elif choice < 0.65:
+                # load-use 与 branch-after-load
+                rd = self.emit_load()
+                if self.rng.random() < 0.5:
+                    self.emit_branch(rd)
+                else:
+                    user = self.pick_rd()
+                    self.emit(encode(Instructions.ADD, user, rd, self.pick_rs()), user)
+            elif choice < 0.80:
+                self.emit_branch()
+            elif choice < 0.88:
+                self.emit_jal()
+            elif choice < 0.96:
+                self.emit_jalr()
+            else:
+                self.emit_csr()
+
+        while self.remaining() > 1:
+            self.emit(NOP)
+        self.emit(encode(Instructions.EBREAK, imm=1))
+        return self.program
+
+
+def generate_program(seed: int, length: int, word_only: bool = True) -> list[int]:
+    return ProgramGenerator(random.Random(seed), length, word_only).generate()
+
+
+def write_hex(program: list[int], path: str):
+    # 与 scripts/extract.py 的输出格式相同
+    with open(path, "w") as f:
+        for code in program:
+            f.write(f"{code:08x}\n")
+
+
+def check_program(binary: str, program: list[int], max_steps: int = 100000) -> str | None:
+    """Returns a description of the first mismatch between the pipeline and the ISS, if any."""
+    iss = ISS(program)
+    expected = iss.run(max_steps)
+    if not iss.halted:
+        return None
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        hex_path = os.path.join(work_dir, "program.hex")
+        write_hex(program, hex_path)
+        try:
+            raw = run_image(binary, hex_path, os.path.join(work_dir, "run"))
+        except RuntimeError as e:
+            return str(e)
+
+    divergence = compare_commits(expected, parse_commits(raw))
+    return str(divergence) if divergence else None
+
+
+def shrink(program: list[int], fails: Callable[[list[int]], bool]) -> list[int]:
+    # 逐条替换成 NOP，保持地址不变从而分支偏移仍然有效
+    program = list(program)
+    changed = True
+    while changed:
+        changed = False
+        for index in range(len(program) - 1):
+            if program[index] == NOP:
+                continue
+            candidate = program[:index] + [NOP] + program[index + 1 :]
+            if fails(candidate):
+                program = candidate
+                changed = True
+    return program
+
+
+def fuzz_one(binary: str, seed: int, length: int, word_only: bool) -> tuple[int, str | None]:
+    return seed, check_program(binary, generate_program(seed, length, word_only))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Differential fuzzing of the pipeline against the ISS.")
+    parser.add_argument("--count", "-n", type=int, default=100, help="Number of random programs")
+    parser.add_argument("--length", type=int, default=200, help="Instructions per program")
+    parser.add_argument("--seed", type=int, default=0, help="First seed")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="Number of worker processes")
+    # 访存阶段目前只支持整字访问，字节、半字访问默认不生成
+    parser.add_argument("--subword", action="store_true", help="Also generate byte and halfword loads and stores")
+    parser.add_argument("--out", "-o", type=str, default="out/fuzz", help="Directory for failing programs")
+    args = parser.parse_args()
+
+    word_only = not args.subword
+    binary = build_config(CPUConfig(), 100000, trace_level=TraceLevel.COMMIT)
+    seeds = range(args.seed, args.seed + args.count)
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        failures = [
+            (seed, message)
+            for seed, message in pool.map(
+                fuzz_one, repeat(binary), seeds, repeat(args.length), repeat(word_only)
+            )
+            if message
+        ]
+
+    print(f"{len(failures)}/{args.count} programs diverged")
+    os.makedirs(args.out, exist_ok=True)
+    for seed, message in failures:
+        program = generate_program(seed, args.length, word_only)
+        shrunk = shrink(program, lambda candidate: check_program(binary, candidate) is not None)
+        write_hex(program, os.path.join(args.out, f"seed{seed}.hex"))
+        write_hex(shrunk, os.path.join(args.out, f"seed{seed}.min.hex"))
+        kept = sum(code != NOP for code in shrunk)
+        print(f"seed {seed}: {message} ({kept} instructions after shrinking)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+from math import log2
+from assassyn.frontend import *
+from dcache import DCache
+from main_memory import MainMemory, MemoryRequest
+from utils import Bool
+
+
+class ICache(Downstream):
+    verbose: bool
+
+    sets: int
+    ways: int
+    line_words: int
+    latency: int
+
+    set_bits: int
+    offset_bits: int
+    way_bits: int
+    tag_bits: int
+    wait_bits: int
+
+    clocker: Array
+
+    # 每一路单独一组数组，同一周期可以写不同的路
+    valid: list[Array]
+    tags: list[Array]
+    data: list[Array]
+    # 每组下一次替换的路（轮转）
+    victim: Array
+
+    # 交给译码器的指令
+    dout: Array
+
+    refilling: Array
+    refill_line: Array
+    refill_way: Array
+    wait: Array
+    issue_idx: Array
+    # 上一周期发出了读请求，本周期 SRAM 输出对应的字
+    capture_valid: Array
+    capture_idx: Array
+    # 发出读请求时该字在 D-cache 中：D-cache 中的值可能比存储器新
+    snoop_hit: Array
+    snoop_word: Array
+    # 回填期间该行被写过，回填完成后不置有效
+    stale: Array
+    # 回填需要读存储器但端口被 D-cache 占用
+    port_lost: Array
+
+    def __init__(self, verbose: bool, sets: int = 16, ways: int = 2, line_words: int = 4, latency: int = 2):
+        super().__init__()
+
+        for n in (sets, ways, line_words):
+            assert n > 0 and n & (n - 1) == 0
+        assert sets >= 2 and latency >= 0
+
+        self.verbose = verbose
+        self.sets = sets
+        self.ways = ways
+        self.line_words = line_words
+        self.latency = latency
+
+        self.set_bits = int(log2(sets))
+        self.offset_bits = int(log2(line_words))
+        self.way_bits = max(1, int(log2(ways)))
+        self.tag_bits = 30 - self.offset_bits - self.set_bits
+        assert self.tag_bits > 0
+        self.wait_bits = max(1, latency.bit_length())
+
+        self.clocker = RegArray(Bool, 1)
+        self.valid = [RegArray(Bool, sets) for _ in range(ways)]
+        self.tags = [RegArray(Bits(self.tag_bits), sets) for _ in range(ways)]
+        self.data = [RegArray(Bits(32), sets * line_words) for _ in range(ways)]
+        self.victim = RegArray(Bits(self.way_bits), sets)
+        self.dout = RegArray(Bits(32), 1)
+
+        self.refilling = RegArray(Bool, 1)
+        self.refill_line = RegArray(Bits(32), 1)
+        self.refill_way = RegArray(Bits(self.way_bits), 1)
+        self.wait = RegArray(Bits(self.wait_bits), 1)
+        self.issue_idx = RegArray(Bits(self.offset_bits + 1), 1)
+        self.capture_valid = RegArray(Bool, 1)
+        self.capture_idx = RegArray(Bits(self.offset_bits + 1), 1)
+        self.snoop_hit = RegArray(Bool, 1)
+        self.snoop_word = RegArray(Bits(32), 1)
+        self.stale = RegArray(Bool, 1)
+        self.port_lost = RegArray(Bool, 1)
+
+    def extract_set(self, addr: Value) -> Value:
+        low = 2 + self.offset_bits
+        return addr[low : (low + self.set_bits - 1)]
+
+    def extract_tag(self, addr: Value) -> Value:
+        return addr[(2 + self.offset_bits + self.set_bits) : 31]
+
+    def line_base(self, addr: Value) -> Value:
+        low = 2 + self.offset_bits
+        return addr[low:31].concat(Bits(low)(0))
+
+    def data_index(self, set_index: Value, offset: Value | None) -> Value:
+        if self.offset_bits == 0:
+            return set_index
+        return set_index.concat(offset)
+
+    def extract_offset(self, addr: Value) -> Value | None:
+        if self.offset_bits == 0:
+            return None
+        return addr[2 : (self.offset_bits + 1)]
+
+    def fetch(self, addr: Value) -> Value:
+        """Looks addr up and latches the word into dout; the decoder may only consume it on a hit."""
+        set_index = self.extract_set(addr)
+        tag = self.extract_tag(addr)
+        index = self.data_index(set_index, self.extract_offset(addr))
+
+        hit = Bool(0)
+        word = Bits(32)(0)
+        for way in range(self.ways):
+            way_hit = self.valid[way][set_index] & (self.tags[way][set_index] == tag)
+            word = way_hit.select(self.data[way][index], word)
+            hit = hit | way_hit
+
+        self.dout[0] = word
+        return hit
+
+    @downstream.combinational
+    def build(
+        self,
+        clocker: Value,
+        miss_addr: Value,
+        main_memory: MainMemory,
+        mem_request: MemoryRequest,
+        dcache: DCache,
+        dcache_written: Value,
+    ):
+        self.clocker[0] = clocker[0:0]
+
+        data_busy = mem_request.busy()
+        refilling = self.refilling[0]
+        refill_line = self.refill_line[0]
+        refill_set = self.extract_set(refill_line)
+        refill_way = self.refill_way[0]
+        issue_idx = self.issue_idx[0]
+
+        # store 写入 D-cache 时若该行已缓存则使其失效；valid 每周期只写一次，失效优先，开始与完成回填在冲突时推迟
+        store = dcache_written.valid()
+        store_addr = dcache_written.optional(Bits(32)(0))
+        store_set = self.extract_set(store_addr)
+        store_tag = self.extract_tag(store_addr)
+        invalidate = Bool(0)
+        for way in range(self.ways):
+            store_hit = store & self.valid[way][store_set] & (self.tags[way][store_set] == store_tag)
+            with Condition(store_hit):
+                self.valid[way][store_set] = Bool(0)
+            invalidate = invalidate | store_hit
+
+        refill_written = refilling & store & (self.line_base(store_addr) == refill_line)
+        with Condition(refill_written):
+            self.stale[0] = Bool(1)
+
+        start = ~refilling & miss_addr.valid() & ~invalidate
+        with Condition(start):
+            miss_set = self.extract_set(miss_addr)
+            victim = self.victim[miss_set] if self.ways > 1 else Bits(self.way_bits)(0)
+            for way in range(self.ways):
+                with Condition(victim == Bits(self.way_bits)(way)):
+                    self.valid[way][miss_set] = Bool(0)
+            self.refilling[0] = Bool(1)
+            self.refill_line[0] = self.line_base(miss_addr)
+            self.refill_way[0] = victim
+            self.wait[0] = Bits(self.wait_bits)(self.latency)
+            self.issue_idx[0] = Bits(self.offset_bits + 1)(0)
+            self.stale[0] = Bool(0)
+
+        # 先等待 latency 个周期，再逐字读取整行
+        waiting = self.wait[0] != Bits(self.wait_bits)(0)
+        with Condition(refilling & waiting):
+            self.wait[0] = self.wait[0] - Bits(self.wait_bits)(1)
+
+        want_issue = refilling & ~waiting & (issue_idx != Bits(self.offset_bits + 1)(self.line_words))
+        can_issue = want_issue & ~data_busy
+        self.port_lost[0] = want_issue & data_busy
+        self.capture_valid[0] = can_issue
+        with Condition(can_issue):
+            self.issue_idx[0] = issue_idx + Bits(self.offset_bits + 1)(1)
+            self.capture_idx[0] = issue_idx
+            if self.offset_bits == 0:
+                read_addr = refill_line | refill_line
+            else:
+                low = 2 + self.offset_bits
+                read_addr = refill_line[low:31].concat(issue_idx[0 : (self.offset_bits - 1)]).concat(Bits(2)(0))
+            # 写回 D-cache 的脏行在被替换前不会写入存储器，回填优先取 D-cache 中的字
+            snoop_hit, _, snoop_word = dcache.lookup(read_addr)
+            self.snoop_hit[0] = snoop_hit
+            self.snoop_word[0] = snoop_word
+
+        with Condition(self.capture_valid[0]):
+            capture_offset = None if self.offset_bits == 0 else self.capture_idx[0][0 : (self.offset_bits - 1)]
+            for way in range(self.ways):
+                with Condition(refill_way == Bits(self.way_bits)(way)):
+                    self.data[way][self.data_index(refill_set, capture_offset)] = self.snoop_hit[0].select(
+                        self.snoop_word[0], main_memory.get_out()
+                    )
+
+        done = (
+            refilling
+            & (issue_idx == Bits(self.offset_bits + 1)(self.line_words))
+            & ~self.capture_valid[0]
+            & ~invalidate
+        )
+        with Condition(done):
+            for way in range(self.ways):
+                with Condition(refill_way == Bits(self.way_bits)(way)):
+                    self.valid[way][refill_set] = ~(self.stale[0] | refill_written)
+                    self.tags[way][refill_set] = self.extract_tag(refill_line)
+            self.refilling[0] = Bool(0)
+            if self.ways > 1:
+                self.victim[refill_set] = refill_way + Bits(self.way_bits)(1)
+
+        if self.verbose:
+            log(
+                "icache refilling: {}, line: 0x{:08X}, way: {}, wait: {}, issue: {}, start: {}, done: {}, port_lost: {}",
+                refilling,
+                refill_line,
+                refill_way,
+                self.wait[0],
+                issue_idx,
+                start,
+                done,
+                want_issue & data_busy,
+            )
+
+        return read_addr, start
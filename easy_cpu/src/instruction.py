@@ -29,6 +29,7 @@ class OperantFrom(Enum):
     IMM = 2
     PC = 3
     LITERAL_FOUR = 4
+    CSR = 5
 
 
 OF_LEN = ceil(log2(len(OperantFrom)))
@@ -51,6 +52,7 @@ class InstructionArgs(RecodeWrapper):
     change_PC: ValueWrapper
     just_stall: ValueWrapper
     is_jalr: ValueWrapper
+    is_jal: ValueWrapper
 
 
 def default_instruction_arguments() -> InstructionArgs:
@@ -68,6 +70,7 @@ def default_instruction_arguments() -> InstructionArgs:
         change_PC=ValueWrapper(Bool, True),
         just_stall=ValueWrapper(Bool, True),
         is_jalr=ValueWrapper(Bool, True),
+        is_jal=ValueWrapper(Bool, True),
     )
 
 
@@ -288,9 +291,15 @@ class JTypeInstruction(Instruction):
             has_rs1=False,
             has_rs2=False,
             imm=imm_fn,
-            change_PC=True,
+            change_PC=False,
         )
 
+    def select_args(self, cond: Value, instruction: Value, args: InstructionArgs) -> InstructionArgs:
+        # JAL 的目标在译码阶段即可算出，由取指直接跳转，不需要停顿等待执行阶段
+        args = super().select_args(cond, instruction, args)
+        args.is_jal.select(cond, Bool(1))
+        return args
+
 
 class Instructions(Enum):
     ADD = RTypeInstruction(opcode=0b0110011, alu_op=RV32I_ALU.ADD, funct3=0x0, funct7=0x00)
@@ -390,3 +399,12 @@ class Instructions(Enum):
     )
 
     EBREAK = ITypeInstruction(opcode=0b1110011, funct3=0x0, alu_op=RV32I_ALU.ADD, just_stall=True)
+
+    # 仅支持读取性能计数器，rs1 对 CSR 的置位被忽略
+    CSRRS = ITypeInstruction(
+        opcode=0b1110011,
+        funct3=0x2,
+        alu_op=RV32I_ALU.OR,
+        operant1_from=OperantFrom.CSR,
+        operant2_from=OperantFrom.CSR,
+    )
@@ -0,0 +1,464 @@
+import argparse
+from dataclasses import dataclass
+from typing import Callable
+
+from alu import RV32I_ALU
+from instruction import (
+    BTypeInstruction,
+    Instruction,
+    Instructions,
+    ITypeInstruction,
+    JTypeInstruction,
+    OperantFrom,
+    RTypeInstruction,
+    STypeInstruction,
+    UTypeInstruction,
+)
+from perf_counter import PerfEvent
+
+MASK = 0xFFFFFFFF
+
+
+def sext(value: int, bits: int) -> int:
+    sign = 1 << (bits - 1)
+    return ((value & (sign - 1)) - (value & sign)) & MASK
+
+
+def i_imm(word: int) -> int:
+    return sext(word >> 20, 12)
+
+
+def s_imm(word: int) -> int:
+    return sext(((word >> 25) << 5) | ((word >> 7) & 0x1F), 12)
+
+
+def b_imm(word: int) -> int:
+    imm = ((word >> 31) & 1) << 12
+    imm |= ((word >> 7) & 1) << 11
+    imm |= ((word >> 25) & 0x3F) << 5
+    imm |= ((word >> 8) & 0xF) << 1
+    return sext(imm, 13)
+
+
+def u_imm(word: int) -> int:
+    return word & 0xFFFFF000
+
+
+def j_imm(word: int) -> int:
+    imm = ((word >> 31) & 1) << 20
+    imm |= ((word >> 12) & 0xFF) << 12
+    imm |= ((word >> 20) & 1) << 11
+    imm |= ((word >> 21) & 0x3FF) << 1
+    return sext(imm, 21)
+
+
+IMM_DECODERS = {
+    RTypeInstruction: lambda word: 0,
+    ITypeInstruction: i_imm,
+    STypeInstruction: s_imm,
+    BTypeInstruction: b_imm,
+    UTypeInstruction: u_imm,
+    JTypeInstruction: j_imm,
+}
+
+
+def to_signed(value: int) -> int:
+    return value - (1 << 32) if value & 0x80000000 else value
+
+
+def alu_int(op: RV32I_ALU, operant1: int, operant2: int) -> int:
+    # 与 alu.alu 保持一致
+    shifter = operant2 & 0x1F
+    match op:
+        case RV32I_ALU.ADD:
+            return (operant1 + operant2) & MASK
+        case RV32I_ALU.SUB:
+            return (operant1 - operant2) & MASK
+        case RV32I_ALU.SLL:
+            return (operant1 << shifter) & MASK
+        case RV32I_ALU.SLT:
+            return int(to_signed(operant1) < to_signed(operant2))
+        case RV32I_ALU.SLTU:
+            return int(operant1 < operant2)
+        case RV32I_ALU.XOR:
+            return operant1 ^ operant2
+        case RV32I_ALU.SRA:
+            return (to_signed(operant1) >> shifter) & MASK
+        case RV32I_ALU.SRL:
+            return operant1 >> shifter
+        case RV32I_ALU.OR:
+            return operant1 | operant2
+        case RV32I_ALU.AND:
+            return operant1 & operant2
+
+
+def alu_expr(op: RV32I_ALU, operant1: str, operant2: str) -> str:
+    # 生成与 alu_int 等价的 Python 表达式，供基本块翻译使用
+    match op:
+        case RV32I_ALU.ADD:
+            return f"(({operant1}) + ({operant2})) & MASK"
+        case RV32I_ALU.SUB:
+            return f"(({operant1}) - ({operant2})) & MASK"
+        case RV32I_ALU.SLL:
+            return f"(({operant1}) << (({operant2}) & 0x1F)) & MASK"
+        case RV32I_ALU.SLT:
+            return f"int(to_signed({operant1}) < to_signed({operant2}))"
+        case RV32I_ALU.SLTU:
+            return f"int(({operant1}) < ({operant2}))"
+        case RV32I_ALU.XOR:
+            return f"({operant1}) ^ ({operant2})"
+        case RV32I_ALU.SRA:
+            return f"(to_signed({operant1}) >> (({operant2}) & 0x1F)) & MASK"
+        case RV32I_ALU.SRL:
+            return f"({operant1}) >> (({operant2}) & 0x1F)"
+        case RV32I_ALU.OR:
+            return f"({operant1}) | ({operant2})"
+        case RV32I_ALU.AND:
+            return f"({operant1}) & ({operant2})"
+
+
+def matches_word(instruction: Instruction, word: int) -> bool:
+    return (
+        word & 0x7F == instruction.opcode
+        and (instruction.funct3 is None or (word >> 12) & 0x7 == instruction.funct3)
+        and (instruction.funct7 is None or word >> 25 == instruction.funct7)
+    )
+
+
+@dataclass(frozen=True)
+class Decoded:
+    kind: Instructions
+    rd: int
+    rs1: int
+    rs2: int
+    imm: int
+    funct3: int
+
+
+def decode_word(word: int) -> Decoded:
+    for kind in Instructions:
+        instruction = kind.value
+        if matches_word(instruction, word):
+            imm = IMM_DECODERS[type(instruction)](word)
+            rd = (word >> 7) & 0x1F if instruction.has_rd else 0
+            rs1 = (word >> 15) & 0x1F if instruction.has_rs1 else 0
+            rs2 = (word >> 20) & 0x1F if instruction.has_rs2 else 0
+            return Decoded(kind, rd, rs1, rs2, imm, (word >> 12) & 0x7)
+    raise ValueError(f"Unknown instruction: 0x{word:08x}")
+
+
+@dataclass
+class Commit:
+    pc: int
+    rd: int
+    value: int
+    # 读取计数器的结果依赖流水线时序，只比较 pc 与 rd
+    checked: bool = True
+    # 缺失的 load 由 D-cache 回填提交，可以晚于之后的指令
+    fill: bool = False
+
+    def __str__(self) -> str:
+        value = f"0x{self.value:08x}" if self.checked else "<csr>"
+        kind = "fill " if self.fill else ""
+        return f"{kind}pc=0x{self.pc:08x} x{self.rd}={value}"
+
+
+class ISS:
+    # 基本块最多包含的指令数
+    MAX_BLOCK_LEN = 64
+
+    regs: list[int]
+    pc: int
+    # 字地址 -> 字，未写入过的地址读为 0
+    memory: dict[int, int]
+    instret: int
+    halted: bool
+    record_commits: bool
+    commits: list[Commit]
+
+    decode_cache: dict[int, Decoded]
+    # 起始 pc -> 翻译后的基本块，返回下一个基本块的 pc
+    blocks: dict[int, Callable[[list[int], list[Commit]], int]]
+    # 字地址 -> 包含该字的基本块起始 pc，用于写代码时使块失效
+    code_blocks: dict[int, set[int]]
+
+    def __init__(self, image: list[int], record_commits: bool = True):
+        self.regs = [0] * 32
+        self.pc = 0
+        self.memory = {i: word for i, word in enumerate(image) if word}
+        self.instret = 0
+        self.halted = False
+        self.record_commits = record_commits
+        self.commits = []
+        self.decode_cache = {}
+        self.blocks = {}
+        self.code_blocks = {}
+
+    @classmethod
+    def from_hex(cls, path: str) -> "ISS":
+        with open(path, "r") as f:
+            return cls([int(line, 16) for line in f if line.strip()])
+
+    def decode(self, word: int) -> Decoded:
+        decoded = self.decode_cache.get(word)
+        if decoded is None:
+            decoded = decode_word(word)
+            self.decode_cache[word] = decoded
+        return decoded
+
+    def load(self, addr: int, funct3: int) -> int:
+        # funct3 低两位为访问宽度，第 2 位表示无符号扩展
+        size = 1 << (funct3 & 0x3)
+        shift = (addr & 0x3) * 8
+        value = (self.memory.get(addr >> 2, 0) >> shift) & ((1 << (size * 8)) - 1)
+        if funct3 & 0x4 or size == 4:
+            return value
+        return sext(value, size * 8)
+
+    def store(self, addr: int, funct3: int, value: int) -> bool:
+        size = 1 << (funct3 & 0x3)
+        shift = (addr & 0x3) * 8
+        mask = ((1 << (size * 8)) - 1) << shift
+        old = self.memory.get(addr >> 2, 0)
+        self.memory[addr >> 2] = (old & ~mask) | ((value << shift) & mask)
+        return self.invalidate(addr >> 2)
+
+    def invalidate(self, word_addr: int) -> bool:
+        block_pcs = self.code_blocks.pop(word_addr, None)
+        if not block_pcs:
+            return False
+        for block_pc in block_pcs:
+            self.blocks.pop(block_pc, None)
+        return True
+
+    def read_csr(self, csr: int) -> int:
+        # 只模拟 instret，其余计数器与微结构相关，读为 0
+        if csr == PerfEvent.INSTRET.value:
+            return self.instret & MASK
+        return 0
+
+    def step(self):
+        pc = self.pc
+        d = self.decode(self.memory.get(pc >> 2, 0))
+        instruction = d.kind.value
+        rs1 = self.regs[d.rs1]
+        rs2 = self.regs[d.rs2]
+
+        if d.kind == Instructions.EBREAK:
+            self.halted = True
+            self.instret += 1
+            return
+
+        operants = {
+            OperantFrom.RS1: rs1,
+            OperantFrom.RS2: rs2,
+            OperantFrom.IMM: d.imm,
+            OperantFrom.PC: pc,
+            OperantFrom.LITERAL_FOUR: 4,
+        }
+        if d.kind == Instructions.CSRRS:
+            operants[OperantFrom.CSR] = self.read_csr(d.imm & 0xFFF)
+
+        alu_info = instruction.alu_info
+        result = alu_int(alu_info.alu_op, operants[alu_info.operant1_from], operants[alu_info.operant2_from])
+
+        next_pc = (pc + 4) & MASK
+        memory_operation = getattr(instruction, "memory_operation", None)
+        if isinstance(instruction, BTypeInstruction):
+            if (result != 0) ^ instruction.branch_flip:
+                next_pc = (pc + d.imm) & MASK
+        elif isinstance(instruction, STypeInstruction):
+            self.store(result, d.funct3, rs2)
+        elif memory_operation is not None:
+            result = self.load(result, d.funct3)
+        elif d.kind == Instructions.JAL:
+            next_pc = (pc + d.imm) & MASK
+        elif d.kind == Instructions.JALR:
+            next_pc = (rs1 + d.imm) & MASK & ~1
+
+        if d.rd != 0:
+            self.regs[d.rd] = result
+            if self.record_commits:
+                self.commits.append(Commit(pc, d.rd, result, d.kind != Instructions.CSRRS))
+
+        self.pc = next_pc
+        self.instret += 1
+
+    def translate(self, start: int) -> Callable[[list[int], list[Commit]], int]:
+        """Compiles the straight-line run of instructions starting at start into one Python function."""
+        lines = ["def block(r, c):"]
+        pc = start
+        count = 0
+
+        def emit(line: str):
+            lines.append("    " + line)
+
+        def leave(next_pc: str, executed: int, indent: str = ""):
+            emit(f"{indent}iss.instret += {executed}")
+            emit(f"{indent}return {next_pc}")
+
+        def write_rd(d: Decoded, value: str):
+            if d.rd == 0:
+                return
+            emit(f"r[{d.rd}] = {value}")
+            if self.record_commits:
+                emit(f"c.append(Commit({pc}, {d.rd}, r[{d.rd}], {d.kind != Instructions.CSRRS}))")
+
+        while True:
+            try:
+                d = self.decode(self.memory.get(pc >> 2, 0))
+            except ValueError:
+                # 非法指令留到真正执行时再报错
+                if count == 0:
+                    raise
+                leave(str(pc), count)
+                break
+
+            self.code_blocks.setdefault(pc >> 2, set()).add(start)
+            instruction = d.kind.value
+            rs1 = f"r[{d.rs1}]" if d.rs1 else "0"
+            rs2 = f"r[{d.rs2}]" if d.rs2 else "0"
+            count += 1
+
+            if d.kind == Instructions.EBREAK:
+                emit("iss.halted = True")
+                leave(str(pc), count)
+                break
+
+            operants = {
+                OperantFrom.RS1: rs1,
+                OperantFrom.RS2: rs2,
+                OperantFrom.IMM: str(d.imm),
+                OperantFrom.PC: str(pc),
+                OperantFrom.LITERAL_FOUR: "4",
+                OperantFrom.CSR: f"iss.read_csr({d.imm & 0xFFF})",
+            }
+            alu_info = instruction.alu_info
+            result = alu_expr(alu_info.alu_op, operants[alu_info.operant1_from], operants[alu_info.operant2_from])
+            memory_operation = getattr(instruction, "memory_operation", None)
+
+            if isinstance(instruction, BTypeInstruction):
+                taken = f"({result}) == 0" if instruction.branch_flip else f"({result}) != 0"
+                emit(f"if {taken}:")
+                leave(str((pc + d.imm) & MASK), count, "    ")
+                leave(str((pc + 4) & MASK), count)
+                break
+            elif isinstance(instruction, STypeInstruction):
+                # 写到已翻译的代码时当前块可能已经过期，立即退出
+                emit(f"if iss.store({result}, {d.funct3}, {rs2}):")
+                leave(str((pc + 4) & MASK), count, "    ")
+            elif memory_operation is not None:
+                write_rd(d, f"iss.load({result}, {d.funct3})")
+            elif d.kind == Instructions.JAL:
+                write_rd(d, str((pc + 4) & MASK))
+                leave(str((pc + d.imm) & MASK), count)
+                break
+            elif d.kind == Instructions.JALR:
+                emit(f"t = ({rs1} + {d.imm}) & MASK & ~1")
+                write_rd(d, str((pc + 4) & MASK))
+                leave("t", count)
+                break
+            elif d.kind == Instructions.CSRRS:
+                # 读计数器前需要先更新 instret
+                emit(f"iss.instret += {count - 1}")
+                write_rd(d, result)
+                leave(str((pc + 4) & MASK), 1)
+                break
+            else:
+                write_rd(d, result)
+
+            pc = (pc + 4) & MASK
+            if count >= self.MAX_BLOCK_LEN:
+                leave(str(pc), count)
+                break
+
+        namespace = {"MASK": MASK, "to_signed": to_signed, "Commit": Commit, "iss": self}
+        exec("\n".join(lines), namespace)
+        block = namespace["block"]
+        self.blocks[start] = block
+        return block
+
+    def run(self, max_steps: int = 1000000, translated: bool = True) -> list[Commit]:
+        if not translated:
+            for _ in range(max_steps):
+                if self.halted:
+                    break
+                self.step()
+            return self.commits
+
+        # 以基本块为单位检查步数上限，可能略微超出 max_steps
+        blocks = self.blocks
+        regs = self.regs
+        commits = self.commits
+        pc = self.pc
+        while not self.halted and self.instret < max_steps:
+            block = blocks.get(pc) or self.translate(pc)
+            pc = block(regs, commits)
+        self.pc = pc
+        return self.commits
+
+
+@dataclass
+class Divergence:
+    index: int
+    expected: Commit | None
+    actual: Commit | None
+
+    def __str__(self) -> str:
+        return f"commit #{self.index}: expected {self.expected}, got {self.actual}"
+
+
+def same_commit(expected: Commit, actual: Commit) -> bool:
+    return (
+        expected.pc == actual.pc
+        and expected.rd == actual.rd
+        and (not expected.checked or expected.value == actual.value)
+    )
+
+
+def compare_commits(expected: list[Commit], actual: list[Commit]) -> Divergence | None:
+    # 除回填外的提交按程序顺序逐条比较；回填不在顺序中，按 pc 与 rd 对应到程序中的位置
+    in_order = [a for a in actual if not a.fill]
+    fills = [a for a in actual if a.fill]
+    cursor = 0
+
+    for index, e in enumerate(expected):
+        a = in_order[cursor] if cursor < len(in_order) else None
+        if a is not None and same_commit(e, a):
+            cursor += 1
+            continue
+        fill = next((i for i, f in enumerate(fills) if f.pc == e.pc and f.rd == e.rd), None)
+        if fill is None or not same_commit(e, fills[fill]):
+            return Divergence(index, e, a if fill is None else fills[fill])
+        fills.pop(fill)
+
+    if cursor < len(in_order):
+        return Divergence(len(expected), None, in_order[cursor])
+    if fills:
+        return Divergence(len(expected), None, fills[0])
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a program on the reference model.")
+    parser.add_argument("hex", type=str, help="Program image")
+    parser.add_argument("--diff", action="store_true", help="Compare the commit stream against the pipeline")
+    parser.add_argument("--max-steps", type=int, default=1000000)
+    args = parser.parse_args()
+
+    iss = ISS.from_hex(args.hex)
+    commits = iss.run(args.max_steps)
+    print(f"halted: {iss.halted}, instret: {iss.instret}, x10: 0x{iss.regs[10]:08x}")
+
+    if args.diff:
+        from config import CPUConfig
+        from simulator import build_config, parse_commits, run_image
+        from write_back import TraceLevel
+
+        binary = build_config(CPUConfig(), 1000000, trace_level=TraceLevel.COMMIT)
+        divergence = compare_commits(commits, parse_commits(run_image(binary, args.hex)))
+        print(divergence or "commit streams match")
+
+
+if __name__ == "__main__":
+    main()
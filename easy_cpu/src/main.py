@@ -3,6 +3,7 @@ from assassyn.frontend import *
 from assassyn.backend import elaborate
 from assassyn.utils import run_simulator, run_verilator
 from cpu import CPU
+from perf_counter import parse_counters, summarize
 
 
 def main():
@@ -20,6 +21,10 @@ def main():
     with open("out/primes.out", "w") as f:
         f.write(raw)
 
+    counters = parse_counters(raw)
+    if counters:
+        print(summarize(counters))
+
 
 if __name__ == "__main__":
     main()
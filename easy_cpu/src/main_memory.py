@@ -0,0 +1,41 @@
+from dataclasses import dataclass
+from assassyn.frontend import *
+from utils import Bool
+
+
+@dataclass
+class MemoryRequest:
+    we: Value
+    re: Value
+    addr: Value
+    wdata: Value
+
+    def busy(self) -> Value:
+        return self.we.optional(Bool(0)) | self.re.optional(Bool(0))
+
+
+class MainMemory(Downstream):
+    # I-cache 与 D-cache 共用的单端口存储器，D-cache 优先
+    size: int
+
+    sram: SRAM
+
+    def __init__(self, size: int, init_file: str | None):
+        super().__init__()
+
+        words = size // 4
+        assert size % 4 == 0 and words & (words - 1) == 0, "Memory size must be a power of two in bytes"
+        self.size = size
+        self.sram = SRAM(32, words, init_file)
+
+    @downstream.combinational
+    def build(self, fetch_addr: Value, data: MemoryRequest):
+        data_busy = data.busy()
+        we = data.we.optional(Bool(0))
+        addr = data_busy.select(data.addr.optional(Bits(32)(0)), fetch_addr.optional(Bits(32)(0)))
+
+        # 注意 sram 一个地址对应一个字，从而地址需要截断
+        self.sram.build(we, ~we, addr[2:31].zext(Bits(32)), data.wdata.optional(Bits(32)(0)))
+
+    def get_out(self) -> Value:
+        return self.sram.dout[0]
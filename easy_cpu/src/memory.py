@@ -1,5 +1,7 @@
 from assassyn.frontend import *
 from instruction import MO_LEN, MemoryOperation
+from dcache import DCache
+from main_memory import MemoryRequest
 from utils import Bool, forward_ports, peek_or, pop_or
 
 
@@ -12,12 +14,13 @@ class Memory(Module):
     rs2: Port
     memory_operation: Port
     alu_result: Port
+    just_stall: Port
 
     alu_out: Array
     is_memory_out: Array
-    dcache: SRAM
+    dcache: DCache
 
-    def __init__(self, verbose: bool, dcache: SRAM):
+    def __init__(self, verbose: bool, dcache: DCache):
         super().__init__(
             ports={
                 "instruction_addr": Port(Bits(32)),
@@ -26,6 +29,7 @@ class Memory(Module):
                 "rs2": Port(Bits(32)),
                 "memory_operation": Port(Bits(MO_LEN)),
                 "alu_result": Port(Bits(32)),
+                "just_stall": Port(Bool),
             }
         )
         self.verbose = verbose
@@ -35,6 +39,10 @@ class Memory(Module):
 
     @module.combinational
     def build(self, write_back: Module):
+        # D-cache 缺失处理期间或 store buffer 满时保留端口中的指令；EBREAK 须等 MSHR 中的 load 全部写回、store buffer 清空
+        just_stall = peek_or(self.just_stall, Bool(0))
+        wait_until(~self.dcache.busy() & ~(just_stall & self.dcache.outstanding()))
+
         need_mem = self.memory_operation.valid()
 
         memory_operation = pop_or(self.memory_operation, Bits(MO_LEN)(0))
@@ -43,8 +51,10 @@ class Memory(Module):
         pop_or(self.rs1, Bits(32)(0))
         raw_wdata = pop_or(self.rs2, Bits(32)(0))
 
+        # 交给 MSHR 的 load 不访问缓存，由回填写回寄存器；store 进入 store buffer
+        deferred = self.dcache.deferred[0]
         raw_re = memory_operation <= Bits(MO_LEN)(MemoryOperation.LOAD_HALFU.value)
-        re = need_mem & raw_re
+        re = need_mem & raw_re & ~deferred
         we = need_mem & (~raw_re)
 
         wdata = memory_operation.case(
@@ -55,8 +65,7 @@ class Memory(Module):
             }
         )
 
-        # 注意 sram 一个地址对应一个字，从而地址需要截断
-        self.dcache.build(we, re, addr[2:31].zext(Bits(32)), wdata)
+        request = MemoryRequest(we, re, addr, wdata)
 
         self.is_memory_out[0] = need_mem
         self.alu_out[0] = alu_result
@@ -64,19 +73,25 @@ class Memory(Module):
         if self.verbose:
             log("we: {}, re: {}, addr: 0x{:08X}, wdata: 0x{:08X}", we, re, addr, wdata)
 
-        rd = peek_or(self.rd, Bits(5)(0))
+        rd = deferred.select(Bits(5)(0), peek_or(self.rd, Bits(5)(0)))
+
+        with Condition(deferred & self.rd.valid()):
+            self.rd.pop()
+
+        with Condition(~deferred):
+            forward_ports(write_back, [self.rd])
 
         forward_ports(
             write_back,
             [
                 self.instruction_addr,
-                self.rd,
+                self.just_stall,
             ],
         )
 
         write_back.async_called()
 
-        return rd
+        return rd, request
 
     def get_out(self) -> Value:
         # TODO: 添加字节、半字支持
@@ -0,0 +1,179 @@
+import re
+from enum import Enum
+from assassyn.frontend import *
+from dcache import PrefetchEvents
+from predictor import PredictFeedback
+from utils import Bool
+
+
+class PerfEvent(Enum):
+    # 取值为软件读取该计数器时使用的只读 CSR 编号
+    CYCLE = 0xC00
+    INSTRET = 0xC02
+    BRANCH = 0xC03
+    MISPREDICT = 0xC04
+    DATA_STALL = 0xC05
+    FETCH_STALL = 0xC06
+    FLUSH = 0xC07
+    DRAIN = 0xC08
+    STRUCT_STALL = 0xC09
+    ICACHE_MISS = 0xC0A
+    ICACHE_STALL = 0xC0B
+    DCACHE_HIT = 0xC0C
+    DCACHE_MISS = 0xC0D
+    DCACHE_STALL = 0xC0E
+    DCACHE_DEFER = 0xC0F
+    PREFETCH_ISSUED = 0xC10
+    PREFETCH_USEFUL = 0xC11
+    PREFETCH_LATE = 0xC12
+    STORE_BUFFER_STALL = 0xC13
+    STORE_FORWARD = 0xC14
+
+
+class PerfCounter(Downstream):
+    verbose: bool
+    instrument: bool
+
+    clocker: Array
+    # EBREAK 已译码，流水线正在排空
+    draining: Array
+
+    counters: dict[PerfEvent, Array]
+
+    def __init__(self, verbose: bool, instrument: bool = False):
+        super().__init__()
+
+        self.verbose = verbose
+        self.instrument = instrument
+        self.clocker = RegArray(Bool, 1)
+        self.draining = RegArray(Bool, 1)
+        self.counters = {event: RegArray(Bits(32), 1) for event in PerfEvent}
+
+    @downstream.combinational
+    def build(
+        self,
+        clocker: Value,
+        should_stall: Value,
+        change_PC: Value,
+        fetch_stalled: Array,
+        fetch_missed: Array,
+        port_lost: Array,
+        icache_miss: Value,
+        dcache_busy: Array,
+        store_full: Array,
+        dcache_hit: Value,
+        dcache_miss: Value,
+        dcache_defer: Value,
+        store_forward: Value,
+        prefetch: PrefetchEvents,
+        exec_addr: Value,
+        mem_rd: Value,
+        release_rd: Value,
+        halt: Value,
+        feed_back: PredictFeedback,
+        flush_flag: Value,
+        should_flush: Array,
+    ):
+        self.clocker[0] = clocker[0:0]
+
+        # 与冲刷同周期译码的 EBREAK 处于错误路径上
+        flush = flush_flag.valid()
+        ebreak_decoded = should_stall.optional(Bool(0)) & ~change_PC.optional(Bool(0))
+        draining = self.draining[0]
+        self.draining[0] = (draining | ebreak_decoded) & ~flush
+
+        is_branch = feed_back.addr.valid()
+        mis_predict = is_branch & (
+            feed_back.predict_branch.optional(Bool(0)) ^ feed_back.actual_branch.optional(Bool(0))
+        )
+        # 取指未停顿且上周期命中 I-cache 时译码器本周期有待译码的指令，D-cache 未停顿流水线时未能发出即是在等待操作数
+        events = {
+            PerfEvent.CYCLE: clocker.valid(),
+            PerfEvent.INSTRET: release_rd.valid(),
+            PerfEvent.BRANCH: is_branch,
+            PerfEvent.MISPREDICT: mis_predict,
+            PerfEvent.DATA_STALL: ~should_stall.valid() & ~fetch_stalled[0] & ~fetch_missed[0] & ~dcache_busy[0] & ~store_full[0],
+            PerfEvent.FETCH_STALL: fetch_stalled[0] & ~draining,
+            PerfEvent.FLUSH: flush,
+            PerfEvent.DRAIN: draining,
+            PerfEvent.STRUCT_STALL: port_lost[0],
+            PerfEvent.ICACHE_MISS: icache_miss.optional(Bool(0)),
+            PerfEvent.ICACHE_STALL: fetch_missed[0],
+            PerfEvent.DCACHE_HIT: dcache_hit,
+            PerfEvent.DCACHE_MISS: dcache_miss,
+            PerfEvent.DCACHE_STALL: dcache_busy[0],
+            PerfEvent.DCACHE_DEFER: dcache_defer,
+            PerfEvent.PREFETCH_ISSUED: prefetch.issued,
+            PerfEvent.PREFETCH_USEFUL: prefetch.useful,
+            PerfEvent.PREFETCH_LATE: prefetch.late,
+            PerfEvent.STORE_BUFFER_STALL: store_full[0],
+            PerfEvent.STORE_FORWARD: store_forward,
+        }
+
+        new_values = {}
+        for event, happened in events.items():
+            counter = self.counters[event]
+            new_values[event] = happened.select(counter[0] + Bits(32)(1), counter[0])
+            counter[0] = new_values[event]
+
+        with Condition(halt.valid()):
+            log_format = " ".join(f"{event.name.lower()}={{}}" for event in PerfEvent)
+            log("perf " + log_format, *new_values.values())
+
+        if self.verbose:
+            log(" ".join(f"{event.name.lower()}={{}}" for event in PerfEvent), *new_values.values())
+
+        if self.instrument:
+            log(
+                "stage F={} D={} E={} M={} W={} flushed={} fetch_stall={} icache_stall={} dcache_stall={} drain={}",
+                ~fetch_stalled[0] & ~fetch_missed[0],
+                should_stall.valid(),
+                exec_addr.valid(),
+                mem_rd.valid(),
+                release_rd.valid(),
+                should_flush[0],
+                fetch_stalled[0] & ~draining,
+                fetch_missed[0],
+                dcache_busy[0],
+                draining,
+            )
+
+    def read_csr(self, csr: Value) -> Value:
+        d = {Bits(12)(event.value): self.counters[event][0] for event in PerfEvent}
+        d[None] = Bits(32)(0)
+        return csr.case(d)  # pyright: ignore[reportArgumentType]
+
+
+def parse_counters(raw: str) -> dict[str, int]:
+    for line in reversed(raw.splitlines()):
+        if "PerfCounter" in line and "perf cycle=" in line:
+            return {name: int(value) for name, value in re.findall(r"(\w+)=(\d+)", line)}
+    return {}
+
+
+def summarize(counters: dict[str, int]) -> str:
+    cycle = counters["cycle"]
+    rows = [
+        ("retired", counters["instret"]),
+        ("data hazard", counters["data_stall"]),
+        # 每次冲刷浪费一条错误路径上已译码的指令
+        ("control hazard", counters["fetch_stall"] + counters["flush"]),
+        ("icache miss", counters["icache_stall"]),
+        ("dcache miss", counters["dcache_stall"]),
+        ("store buffer", counters["store_buffer_stall"]),
+        ("ebreak drain", counters["drain"]),
+    ]
+    lines = [f"{'':<16}{'cycles':>10}{'share':>9}"]
+    for name, value in rows:
+        lines.append(f"{name:<16}{value:>10}{value / max(cycle, 1):>9.1%}")
+    lines.append(f"{'total':<16}{cycle:>10}")
+    lines.append(f"CPI: {cycle / max(counters['instret'], 1):.3f}, mispredict: {counters['mispredict']}/{counters['branch']}")
+    accesses = counters["dcache_hit"] + counters["dcache_miss"]
+    lines.append(
+        f"dcache: {counters['dcache_miss']}/{accesses} misses, {counters['dcache_defer']} served under miss, "
+        f"{counters['store_forward']} forwarded from store buffer"
+    )
+    lines.append(
+        f"prefetch: {counters['prefetch_issued']} issued, {counters['prefetch_useful']} useful, {counters['prefetch_late']} late"
+    )
+    return "\n".join(lines)
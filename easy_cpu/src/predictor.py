@@ -3,7 +3,6 @@ from dataclasses import dataclass
 from enum import Enum
 from assassyn.frontend import *
 from assassyn.frontend import Value
-from executor import Executor
 from utils import Bool
 
 
@@ -27,16 +26,22 @@ class Predictor(Downstream, ABC):
         pass
 
     @downstream.combinational
-    def build(self, branch_addr: Value, feed_back: PredictFeedback, executor: Executor) -> Value:
-        self.build_feedback(feed_back)
+    def build(self, branch_addr: Value, feed_back: PredictFeedback, flush_flag: Value, executor: Module) -> Value:
+        with Condition(feed_back.addr.valid()):
+            self.build_feedback(feed_back)
 
         is_valid = branch_addr.valid()
         with Condition(is_valid):
             branch_predict = self.build_predict(branch_addr)
             branch_predict = branch_predict | branch_predict
             executor.bind(branch_predict=branch_predict)
+
+        self.build_history(is_valid, branch_predict, feed_back, flush_flag.valid())
         return branch_predict
 
+    def build_history(self, is_predict: Value, branch_predict: Value, feed_back: PredictFeedback, flush: Value):
+        pass
+
 
 class AlwaysBranchPredictor(Predictor):
     def __init__(self):
@@ -67,38 +72,172 @@ class BinaryPredictState(Enum):
     StronglyNo = 3
 
 
+def is_branch_state(state: Value) -> Value:
+    return (state == Bits(2)(BinaryPredictState.StronglyB.value)) | (
+        state == Bits(2)(BinaryPredictState.WeaklyB.value)
+    )
+
+
+def next_state(state: Value, actual_branch: Value) -> Value:
+    return actual_branch.select(
+        (state == Bits(2)(0)).select(state, state - Bits(2)(1)),
+        ((state == Bits(2)(3)).select(state, state + Bits(2)(1))),
+    )
+
+
+def extract_index(branch_addr: Value, bits: int, folded: bool = False) -> Value:
+    # 指令 4 字节对齐，最低两位恒为 0，不参与索引；折叠时将其余高位逐段异或进索引
+    assert 0 < bits <= 30
+    index = branch_addr[2 : (bits + 1)]
+    if folded:
+        for low in range(bits + 2, 32, bits):
+            high = min(low + bits, 32) - 1
+            chunk = branch_addr[low:high]
+            if high - low + 1 < bits:
+                chunk = chunk.zext(Bits(bits))
+            index = index ^ chunk
+    return index
+
+
+def shift_history(history: Value, branch: Value) -> Value:
+    dtype: DType = history.dtype  # pyright: ignore[reportAssignmentType]
+    bits: int = dtype.bits
+    if bits == 1:
+        return branch | branch
+    return history[0 : bits - 2].concat(branch)
+
+
 class BinaryPredictor(Predictor):
     bits: int
+    folded: bool
+
+    states: Array
+
+    def __init__(self, bits: int, init_state: BinaryPredictState, folded: bool = False):
+        super().__init__()
+
+        assert bits > 0
+        self.bits = bits
+        self.folded = folded
+        size = 1 << bits
+        self.states = RegArray(Bits(2), size, [init_state.value] * size)
+
+    def build_predict(self, branch_addr: Value) -> Value:
+        return is_branch_state(self.states[self.extract_branch_bits(branch_addr)])
+
+    def extract_branch_bits(self, branch_addr):
+        return extract_index(branch_addr, self.bits, self.folded)
+
+    def build_feedback(self, feed_back: PredictFeedback):
+        branch_bits = self.extract_branch_bits(feed_back.addr)
+        self.states[branch_bits] = next_state(self.states[branch_bits], feed_back.actual_branch)
+
+
+class GsharePredictor(Predictor):
+    bits: int
+    history_bits: int
+    folded: bool
 
     states: Array
+    # 预测时推测更新的全局历史
+    history: Array
+    # 按实际跳转结果更新的全局历史，用于训练与误预测后的修复
+    committed_history: Array
 
-    def __init__(self, bits: int, init_state: BinaryPredictState):
+    def __init__(self, bits: int, history_bits: int, init_state: BinaryPredictState, folded: bool = False):
         super().__init__()
 
         assert bits > 0
+        assert 0 < history_bits <= bits
         self.bits = bits
+        self.history_bits = history_bits
+        self.folded = folded
         size = 1 << bits
         self.states = RegArray(Bits(2), size, [init_state.value] * size)
+        self.history = RegArray(Bits(history_bits), 1)
+        self.committed_history = RegArray(Bits(history_bits), 1)
+
+    def extract_branch_bits(self, branch_addr: Value, history: Value) -> Value:
+        if self.history_bits < self.bits:
+            history = history.zext(Bits(self.bits))
+        return extract_index(branch_addr, self.bits, self.folded) ^ history
 
     def build_predict(self, branch_addr: Value) -> Value:
-        state = self.states[self.extract_branch_bits(branch_addr)]
+        return is_branch_state(self.states[self.extract_branch_bits(branch_addr, self.history[0])])
 
-        return (state == Bits(2)(BinaryPredictState.StronglyB.value)) | (
-            state == Bits(2)(BinaryPredictState.WeaklyB.value)
+    def build_feedback(self, feed_back: PredictFeedback):
+        # 更老的分支都已提交，此时的提交历史即为该分支预测时所用的历史
+        history = self.committed_history[0]
+        branch_bits = self.extract_branch_bits(feed_back.addr, history)
+        self.states[branch_bits] = next_state(self.states[branch_bits], feed_back.actual_branch)
+        self.committed_history[0] = shift_history(history, feed_back.actual_branch)
+
+    def build_history(self, is_predict: Value, branch_predict: Value, feed_back: PredictFeedback, flush: Value):
+        # 冲刷既可能来自分支误预测，也可能来自跳转目标预测错误，两种情况都要丢弃错误路径上的推测历史
+        committed_history = self.committed_history[0]
+        repaired = feed_back.addr.valid().select(
+            shift_history(committed_history, feed_back.actual_branch.optional(Bool(0))), committed_history
         )
 
-    def extract_branch_bits(self, branch_addr):
-        return branch_addr[0 : (self.bits - 1)]
+        history = self.history[0]
+        speculated = shift_history(history, branch_predict)
+        self.history[0] = flush.select(repaired, is_predict.select(speculated, history))
+
+
+class TournamentPredictor(GsharePredictor):
+    local_bits: int
+    chooser_bits: int
+
+    local_states: Array
+    # 选择器计数器：偏向“跳转”一侧时采用全局预测，否则采用局部预测
+    choosers: Array
+
+    def __init__(
+        self,
+        local_bits: int,
+        bits: int,
+        history_bits: int,
+        chooser_bits: int,
+        init_state: BinaryPredictState,
+        folded: bool = False,
+    ):
+        super().__init__(bits, history_bits, init_state, folded)
+
+        assert local_bits > 0
+        assert chooser_bits > 0
+        self.local_bits = local_bits
+        self.chooser_bits = chooser_bits
+        local_size = 1 << local_bits
+        chooser_size = 1 << chooser_bits
+        self.local_states = RegArray(Bits(2), local_size, [init_state.value] * local_size)
+        self.choosers = RegArray(Bits(2), chooser_size, [BinaryPredictState.WeaklyNo.value] * chooser_size)
+
+    def extract_local_bits(self, branch_addr: Value) -> Value:
+        return extract_index(branch_addr, self.local_bits, self.folded)
+
+    def extract_chooser_bits(self, branch_addr: Value) -> Value:
+        return extract_index(branch_addr, self.chooser_bits, self.folded)
+
+    def build_predict(self, branch_addr: Value) -> Value:
+        local_predict = is_branch_state(self.local_states[self.extract_local_bits(branch_addr)])
+        global_predict = super().build_predict(branch_addr)
+        use_global = is_branch_state(self.choosers[self.extract_chooser_bits(branch_addr)])
+        return use_global.select(global_predict, local_predict)
 
     def build_feedback(self, feed_back: PredictFeedback):
         addr = feed_back.addr
         actual_branch = feed_back.actual_branch
 
-        branch_bits = self.extract_branch_bits(addr)
-        state = self.states[branch_bits]
+        local_bits = self.extract_local_bits(addr)
+        local_state = self.local_states[local_bits]
+        global_state = self.states[self.extract_branch_bits(addr, self.committed_history[0])]
 
-        new_state = actual_branch.select(
-            (state == Bits(2)(0)).select(state, state - Bits(2)(1)),
-            ((state == Bits(2)(3)).select(state, state + Bits(2)(1))),
-        )
-        self.states[branch_bits] = new_state
+        # 两个部件的预测按当前表项重新计算，只在二者意见不同时训练选择器
+        local_correct = is_branch_state(local_state) == actual_branch
+        global_correct = is_branch_state(global_state) == actual_branch
+        chooser_bits = self.extract_chooser_bits(addr)
+        with Condition(local_correct != global_correct):
+            self.choosers[chooser_bits] = next_state(self.choosers[chooser_bits], global_correct)
+
+        self.local_states[local_bits] = next_state(local_state, actual_branch)
+        super().build_feedback(feed_back)
@@ -0,0 +1,57 @@
+from assassyn.frontend import *
+from utils import Bool
+
+
+class StridePrefetcher:
+    bits: int
+
+    valid: Array
+    tags: Array
+    last_addr: Array
+    strides: Array
+    # 连续出现相同步长的次数，饱和于 3
+    confidence: Array
+
+    def __init__(self, bits: int):
+        # 按 load 指令的地址索引，低两位不参与索引与标签
+        assert 0 < bits < 30
+        self.bits = bits
+        size = 1 << bits
+        self.valid = RegArray(Bool, size)
+        self.tags = RegArray(Bits(30 - bits), size)
+        self.last_addr = RegArray(Bits(32), size)
+        self.strides = RegArray(Bits(32), size)
+        self.confidence = RegArray(Bits(2), size)
+
+    def extract_index(self, addr: Value) -> Value:
+        return addr[2 : (self.bits + 1)]
+
+    def extract_tag(self, addr: Value) -> Value:
+        return addr[(self.bits + 2) : 31]
+
+    def observe(self, pc: Value, addr: Value, line_bytes: int) -> tuple[Value, Value]:
+        """Trains the entry of pc on addr; returns whether to prefetch and the address to prefetch."""
+        index = self.extract_index(pc)
+        hit = self.valid[index] & (self.tags[index] == self.extract_tag(pc))
+        confidence = self.confidence[index]
+        delta = addr - self.last_addr[index]
+        same = hit & (delta == self.strides[index]) & (delta != Bits(32)(0))
+        # 偶尔不同的步长（如换行）只降低置信度，置信度为 0 时才换成新的步长
+        keep = same | (hit & (confidence != Bits(2)(0)))
+
+        self.valid[index] = Bool(1)
+        self.tags[index] = self.extract_tag(pc)
+        self.last_addr[index] = addr
+        self.strides[index] = keep.select(self.strides[index], hit.select(delta, Bits(32)(0)))
+        self.confidence[index] = same.select(
+            (confidence == Bits(2)(3)).select(confidence, confidence + Bits(2)(1)),
+            keep.select(confidence - Bits(2)(1), Bits(2)(0)),
+        )
+
+        # 连续两次步长相同时预取下一次访问；步长小于一行时预取同方向的下一行
+        stride = self.strides[index]
+        ahead = addr + stride
+        low = (line_bytes - 1).bit_length()
+        same_line = ahead[low:31] == addr[low:31]
+        next_line = stride[31:31].select(addr - Bits(32)(line_bytes), addr + Bits(32)(line_bytes))
+        return same, same_line.select(next_line, ahead)
@@ -0,0 +1,29 @@
+from math import log2
+from assassyn.frontend import *
+
+
+class ReturnAddressStack:
+    depth: int
+
+    entries: Array
+    # 指向栈顶元素，溢出时循环覆盖最老的返回地址
+    top: Array
+
+    def __init__(self, depth: int):
+        assert depth >= 2 and (depth & (depth - 1)) == 0
+        self.depth = depth
+        self.top_bits = int(log2(depth))
+        self.entries = RegArray(Bits(32), depth)
+        self.top = RegArray(Bits(self.top_bits), 1)
+
+    def peek(self) -> Value:
+        return self.entries[self.top[0]]
+
+    def build(self, push: Value, pop: Value, return_addr: Value):
+        top = self.top[0]
+        next_top = top + Bits(self.top_bits)(1)
+
+        with Condition(push):
+            self.entries[next_top] = return_addr
+
+        self.top[0] = push.select(next_top, pop.select(top - Bits(self.top_bits)(1), top))
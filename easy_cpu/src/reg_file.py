@@ -5,6 +5,7 @@ from utils import Bool
 class RegOccupation(Downstream):
     verbose: bool
 
+    clocker: Array
     occupies: list[Array]
 
     def __init__(self, verbose: bool):
@@ -12,10 +13,13 @@ class RegOccupation(Downstream):
 
         self.verbose = verbose
 
+        self.clocker = RegArray(Bool, 1)
         self.occupies = [RegArray(UInt(2), 1) for _ in range(32)]
 
     @downstream.combinational
-    def build(self, occupy_reg: Value, release_reg: Value, flush_flag: Value | None):
+    def build(self, clocker: Value, occupy_reg: Value, release_reg: Value, flush_flag: Value | None, fill_reg: Value):
+        self.clocker[0] = clocker[0:0]
+
         flush: Value
         if flush_flag:
             flush = flush_flag.valid()
@@ -23,7 +27,8 @@ class RegOccupation(Downstream):
             flush = Bool(0)
 
         occupy_reg = flush.select(Bits(5)(0), occupy_reg.optional(Bits(5)(0)))
-        release_reg = release_reg.optional(Bits(5)(0))
+        # MSHR 只在写回级不写寄存器的周期回填，两者不会同时释放
+        release_reg = fill_reg.optional(release_reg.optional(Bits(5)(0)))
 
         with Condition(occupy_reg != release_reg):
             for index in range(1, 32):
@@ -54,6 +59,7 @@ class RegOccupation(Downstream):
 
 
 class RegFile(Downstream):
+    clocker: Array
     regs: Array
 
     rd: Port
@@ -62,11 +68,17 @@ class RegFile(Downstream):
     def __init__(self):
         super().__init__()
 
+        self.clocker = RegArray(Bool, 1)
         self.regs = RegArray(Bits(32), 32)
 
     @downstream.combinational
-    def build(self, rd: Value, rd_data: Value):
-        wait_until(rd.valid() & rd_data.valid())
+    def build(self, clocker: Value, rd: Value, rd_data: Value, fill_rd: Value, fill_data: Value):
+        self.clocker[0] = clocker[0:0]
 
+        rd = rd.optional(Bits(5)(0))
         with Condition(rd != Bits(5)(0)):
             self.regs[rd] = rd_data
+
+        # 写回级不写寄存器时才会回填
+        with Condition(fill_rd.optional(Bits(5)(0)) != Bits(5)(0)):
+            self.regs[fill_rd] = fill_data
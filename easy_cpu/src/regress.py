@@ -0,0 +1,61 @@
+import argparse
+import csv
+import dataclasses
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from config import CPUConfig
+from simulator import AsmCase, CaseResult, build_config, evaluate, load_cases, run_image
+
+
+def run_case(binary: str, case: AsmCase) -> CaseResult:
+    # 每次运行都在独立的临时目录中放置镜像，进程之间互不干扰
+    try:
+        raw = run_image(binary, case.hex_path)
+    except RuntimeError as e:
+        return CaseResult(case.name, False, message=str(e))
+    return evaluate(case, raw)
+
+
+def run_regression(binary: str, cases: list[AsmCase], jobs: int | None = None) -> list[CaseResult]:
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(run_case, repeat(binary), cases))
+
+
+def write_report(results: list[CaseResult], path: str):
+    rows = [dataclasses.asdict(result) for result in results]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", newline="") as f:
+        if path.endswith(".csv"):
+            writer = csv.DictWriter(f, fieldnames=[field.name for field in dataclasses.fields(CaseResult)])
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            json.dump(rows, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the asms suite in parallel against one simulator build.")
+    parser.add_argument("--asms", type=str, default="asms", help="Directory of test programs")
+    parser.add_argument("--report", "-o", type=str, default="out/regress.json", help="Report path (.json or .csv)")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--threshold", type=int, default=1000000, help="Simulation cycle limit")
+    args = parser.parse_args()
+
+    binary = build_config(CPUConfig(), args.threshold)
+    results = run_regression(binary, load_cases(args.asms), args.jobs)
+    write_report(results, args.report)
+
+    for result in results:
+        status = "PASS" if result.passed else "FAIL"
+        print(f"{status} {result.name:<16} cycle: {result.cycles:>8} CPI: {result.cpi:.3f} {result.message}")
+
+    if not all(result.passed for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
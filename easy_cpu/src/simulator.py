@@ -0,0 +1,204 @@
+import glob
+import hashlib
+import importlib.metadata
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import tomllib
+from dataclasses import dataclass
+from functools import cache
+from typing import Callable
+
+from assassyn.frontend import *
+from assassyn.backend import elaborate
+
+from config import CPUConfig
+from cpu import CPU
+from iss import Commit
+from perf_counter import parse_counters
+from write_back import TraceLevel
+
+# 仿真器在运行时从工作目录读取的程序镜像名
+IMAGE_NAME = "exe.hex"
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(os.path.dirname(SRC_DIR), ".sim_cache")
+
+
+@dataclass
+class AsmCase:
+    name: str
+    hex_path: str
+    expected: int
+
+
+@dataclass
+class CaseResult:
+    name: str
+    passed: bool
+    cycles: int = 0
+    instret: int = 0
+    cpi: float = 0.0
+    branches: int = 0
+    mispredicts: int = 0
+    dcache_accesses: int = 0
+    dcache_misses: int = 0
+    message: str = ""
+
+
+@dataclass
+class FinalState:
+    instruction_addr: int
+    regs: list[int]
+
+
+def load_cases(asms_path: str) -> list[AsmCase]:
+    cases = []
+    for name in sorted(os.listdir(asms_path)):
+        hex_path = os.path.join(asms_path, name, name + ".hex")
+        out_path = os.path.join(asms_path, name, name + ".out")
+        with open(out_path, "r") as f:
+            expected = int(f.readline())
+        cases.append(AsmCase(name, hex_path, expected))
+    return cases
+
+
+def parse_final_state(raw: str) -> FinalState | None:
+    write_backs = [line for line in raw.splitlines() if "WriteBackInstance" in line and "instruction_addr=" in line]
+    if not write_backs:
+        return None
+    line = write_backs[-1]
+
+    addr = re.search(r"instruction_addr=(0x[0-9a-fA-F]+)", line)
+    regs = re.findall(r"x(\d+)=(0x[0-9a-fA-F]+)", line)
+    if not addr or len(regs) != 32:
+        return None
+    return FinalState(int(addr.group(1), 16), [int(value, 16) for _, value in regs])
+
+
+def evaluate(case: AsmCase, raw: str) -> CaseResult:
+    result = parse_final_state(raw)
+    if not result:
+        return CaseResult(case.name, False, message=f"Nothing is written back while testing {case.name}")
+    if result.instruction_addr != 0x8:
+        return CaseResult(case.name, False, message=f"The processor is not down properly while testing {case.name}")
+
+    counters = parse_counters(raw)
+    if not counters:
+        return CaseResult(case.name, False, message=f"Can't find performance counters in output while testing {case.name}")
+    cycles, instret = counters["cycle"], counters["instret"]
+    cpi = cycles / max(instret, 1)
+    dcache_misses = counters["dcache_miss"]
+    stats = (
+        cycles,
+        instret,
+        cpi,
+        counters["branch"],
+        counters["mispredict"],
+        counters["dcache_hit"] + dcache_misses,
+        dcache_misses,
+    )
+
+    ret = result.regs[10]
+    if ret != case.expected:
+        return CaseResult(case.name, False, *stats, f"Test failed for {case.name}: expect result is {case.expected}, get {ret}")
+    return CaseResult(case.name, True, *stats)
+
+
+@cache
+def toolchain_version() -> str:
+    """Identifies the assassyn release and the Rust compiler that generate and build the simulator."""
+    try:
+        assassyn = importlib.metadata.version("assassyn")
+    except importlib.metadata.PackageNotFoundError:
+        # 直接把源码目录加入 PYTHONPATH 时没有版本号，按源码内容区分
+        import assassyn as package
+
+        h = hashlib.sha256()
+        package_dir = os.path.dirname(package.__file__)
+        for path in sorted(glob.glob(os.path.join(package_dir, "**", "*.py"), recursive=True)):
+            with open(path, "rb") as f:
+                h.update(f.read())
+        assassyn = h.hexdigest()[:16]
+
+    try:
+        rustc = subprocess.run(["rustc", "--version"], capture_output=True, text=True).stdout.strip()
+    except FileNotFoundError:
+        rustc = ""
+    return f"assassyn {assassyn}, {rustc}"
+
+
+def cache_key(*parts) -> str:
+    """Hashes the build parameters, the toolchain versions and every source file of the CPU."""
+    h = hashlib.sha256()
+    for part in (toolchain_version(), *parts):
+        h.update(repr(part).encode())
+        h.update(b"\0")
+    for path in sorted(glob.glob(os.path.join(SRC_DIR, "*.py"))):
+        h.update(os.path.basename(path).encode())
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+def parse_commits(raw: str) -> list[Commit]:
+    # 需要以 TraceLevel.COMMIT 构建的仿真器
+    commits = re.findall(r"(commit|fill) pc=(0x[0-9a-fA-F]+) x(\d+)=(0x[0-9a-fA-F]+)", raw)
+    return [Commit(int(pc, 16), int(rd), int(value, 16), fill=kind == "fill") for kind, pc, rd, value in commits]
+
+
+def build_simulator(
+    cpu_fn: Callable[[str], CPU], sim_threshold: int, name: str = "easy_cpu", key: str | None = None
+) -> str:
+    """Elaborates and compiles a simulator that loads IMAGE_NAME from its working directory."""
+    cached = os.path.join(CACHE_DIR, key, "simulator") if key else None
+    if cached and os.path.exists(cached):
+        return cached
+
+    sys = SysBuilder(name)
+    with sys:
+        _ = cpu_fn(IMAGE_NAME)
+    # 注意 resource_base 为相对路径，镜像路径在运行时相对于仿真器的工作目录解析
+    sim, _ = elaborate(sys, verbose=False, sim_threshold=sim_threshold, resource_base=".")
+    binary = compile_simulator(sim)
+    if not cached:
+        return binary
+
+    # 先复制到临时文件再改名，并行构建同一配置时不会读到不完整的文件
+    os.makedirs(os.path.dirname(cached), exist_ok=True)
+    tmp_path = f"{cached}.{os.getpid()}"
+    shutil.copy2(binary, tmp_path)
+    os.replace(tmp_path, cached)
+    return cached
+
+
+def build_config(
+    config: CPUConfig,
+    sim_threshold: int,
+    verbose: bool = False,
+    trace_level: TraceLevel = TraceLevel.OFF,
+    name: str = "easy_cpu",
+) -> str:
+    key = cache_key(config, sim_threshold, verbose, trace_level)
+    return build_simulator(lambda image: config.build(image, verbose, trace_level), sim_threshold, name, key)
+
+
+def compile_simulator(sim_path: str) -> str:
+    subprocess.run(["cargo", "build", "--release", "--quiet"], cwd=sim_path, check=True, capture_output=True)
+    with open(os.path.join(sim_path, "Cargo.toml"), "rb") as f:
+        package = tomllib.load(f)["package"]["name"]
+    return os.path.abspath(os.path.join(sim_path, "target", "release", package))
+
+
+def run_image(binary: str, hex_path: str, work_dir: str | None = None) -> str:
+    """Runs a compiled simulator on one image; concurrent runs must use distinct work_dir."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        run_dir = work_dir or tmp_dir
+        os.makedirs(run_dir, exist_ok=True)
+        shutil.copyfile(hex_path, os.path.join(run_dir, IMAGE_NAME))
+        result = subprocess.run([binary], cwd=run_dir, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"Simulator exited with {result.returncode}:\n{result.stderr}")
+        return result.stdout
@@ -0,0 +1,72 @@
+import argparse
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from config import CPUConfig, expand_grid
+from regress import run_case
+from simulator import build_config, load_cases
+
+default_grid = {
+    "predictor": ["always", "never", "binary", "gshare", "tournament"],
+    "bits": [3, 5, 7],
+    "init_state": ["WeaklyB", "WeaklyNo"],
+}
+
+
+def build_indexed(index: int, config: CPUConfig, sim_threshold: int) -> str:
+    # 不同配置的仿真器需要不同的名字，避免并行生成时目录冲突
+    return build_config(config, sim_threshold, name=f"easy_cpu_sweep_{index}")
+
+
+def sweep(configs: list[CPUConfig], asms_path: str, sim_threshold: int, jobs: int | None = None) -> list[dict]:
+    cases = load_cases(asms_path)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        binaries = list(pool.map(build_indexed, range(len(configs)), configs, [sim_threshold] * len(configs)))
+
+        runs = [(config, binary, case) for config, binary in zip(configs, binaries) for case in cases]
+        results = pool.map(run_case, [binary for _, binary, _ in runs], [case for _, _, case in runs])
+
+        rows = []
+        for (config, _, _), result in zip(runs, results):
+            rows.append(
+                {
+                    "config": config.label(),
+                    "program": result.name,
+                    "passed": result.passed,
+                    "cycles": result.cycles,
+                    "cpi": round(result.cpi, 4),
+                    "mispredict_rate": round(result.mispredicts / max(result.branches, 1), 4),
+                    "dcache_miss_rate": round(result.dcache_misses / max(result.dcache_accesses, 1), 4),
+                }
+            )
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the asms suite over a grid of CPU configurations.")
+    parser.add_argument("--grid", type=str, help="JSON file mapping CPUConfig fields to lists of values")
+    parser.add_argument("--asms", type=str, default="asms", help="Directory of test programs")
+    parser.add_argument("--report", "-o", type=str, default="out/sweep.csv", help="Report path")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--threshold", type=int, default=1000000, help="Simulation cycle limit")
+    args = parser.parse_args()
+
+    grid = default_grid
+    if args.grid:
+        with open(args.grid, "r") as f:
+            grid = json.load(f)
+
+    rows = sweep(expand_grid(grid), args.asms, args.threshold, args.jobs)
+
+    os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+    with open(args.report, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"{len(rows)} runs written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,52 @@
+from enum import Enum
 from assassyn.frontend import *
 from memory import Memory
 from reg_file import RegFile
 from utils import Bool, pop_or
 
 
+class TraceLevel(Enum):
+    # 只在停机时输出最终的寄存器状态
+    OFF = 0
+    # 每条写回寄存器的指令输出 pc、rd 与写入值
+    COMMIT = 1
+    # 每次写回都输出全部 32 个寄存器
+    FULL = 2
+
+
 class WriteBack(Module):
     verbose: bool
+    trace_level: TraceLevel
+
+    halted: Array
 
     instruction_addr: Port
     rd: Port
+    just_stall: Port
 
-    def __init__(self, verbose: bool):
+    def __init__(self, verbose: bool, trace_level: TraceLevel = TraceLevel.FULL):
         super().__init__(
             ports={
                 "instruction_addr": Port(Bits(32)),
                 "rd": Port(Bits(5)),
+                "just_stall": Port(Bool),
             }
         )
         self.verbose = verbose
+        self.trace_level = trace_level
+        self.halted = RegArray(Bool, 1)
 
     @module.combinational
     def build(self, reg_file: RegFile, memory: Memory):
         instruction_addr = pop_or(self.instruction_addr, Bits(32)(0))
         rd = pop_or(self.rd, Bits(5)(0))
+        just_stall = pop_or(self.just_stall, Bool(0))
 
         out = memory.get_out()
 
-        reg_file.build(rd, out)
+        if self.trace_level == TraceLevel.COMMIT:
+            with Condition(rd != Bits(5)(0)):
+                log("commit pc=0x{:08X} x{}=0x{:08X}", instruction_addr, rd, out)
 
         log_parts = ["instruction_addr=0x{:08X}"]
         for i in range(32):
@@ -34,6 +54,16 @@ class WriteBack(Module):
         log_format = " ".join(log_parts)
         new_regs = [(rd == Bits(5)(i)).select(out, reg_file.regs[i]) for i in range(32)]
         new_regs[0] = reg_file.regs[0]
-        log(log_format, instruction_addr, *new_regs)
 
-        return rd
+        if self.trace_level == TraceLevel.FULL:
+            log(log_format, instruction_addr, *new_regs)
+
+        # EBREAK 提交即程序结束
+        with Condition(just_stall):
+            halt = just_stall | just_stall
+            self.halted[0] = Bool(1)
+            # FULL 模式下本周期已输出过完整的寄存器状态
+            if self.trace_level != TraceLevel.FULL:
+                log(log_format, instruction_addr, *new_regs)
+
+        return rd, out, halt
@@ -1,53 +1,41 @@
 import os
-import re
-import shutil
 
-from assassyn.frontend import *
-from assassyn.backend import elaborate
-from assassyn.utils import run_simulator
-
-from cpu import CPU
-from predictor import BinaryPredictState, BinaryPredictor
-from utils import run_quietly
+from config import CPUConfig
+from simulator import build_config, evaluate, load_cases, parse_final_state, run_image
 
 test_cases_path = "asms"
-work_path = "tmp"
-
-
-def get_predictor():
-    return BinaryPredictor(5, BinaryPredictState.WeaklyB)
 
 
 def test_asms():
-    work_hex_path = os.path.join(work_path, "exe.hex")
-
-    os.makedirs(work_path, exist_ok=True)
-    sys = SysBuilder("easy_cpu")
-    with sys:
-        _ = CPU(work_hex_path, get_predictor, verbose=False)
-    sim, _ = elaborate(sys, verbose=False, sim_threshold=1000000, resource_base=os.getcwd())
+    binary = build_config(CPUConfig(predictor="binary", bits=5, init_state="WeaklyB"), sim_threshold=1000000)
 
-    test_cases = os.listdir(test_cases_path)
-    print(test_cases)
+    test_cases = load_cases(test_cases_path)
+    print([test_case.name for test_case in test_cases])
 
     for test_case in test_cases:
-        hex_path = os.path.join(test_cases_path, test_case, test_case + ".hex")
-        out_path = os.path.join(test_cases_path, test_case, test_case + ".out")
-        with open(out_path, "r") as f:
-            expected_result = int(f.readline())
-
-        shutil.copyfile(hex_path, work_hex_path)
-
-        raw, _, stderr = run_quietly(run_simulator, sim)
-        assert isinstance(raw, str), f"Run simulator failed with stderr: \n {stderr}"
-
-        result = raw.splitlines()[-1]
-        assert (
-            "WriteBackInstance" in result and "instruction_addr=0x00000008" in result
-        ), f"The processor is not down properly while testing {test_case}"
-
-        ret = re.search(r"x10=(0x[0-9a-fA-F]+)", result)
-        assert ret, f"Can't find result in the last line of output while testing {test_case}"
-        ret = int(ret.group(1), 16)
-        assert ret == expected_result, f"Test failed for {test_case}: expect result is {expected_result}, get {ret}"
-        print(f"{test_case} passed!")
+        raw = run_image(binary, test_case.hex_path)
+
+        result = evaluate(test_case, raw)
+        assert result.passed, result.message
+        print(f"{test_case.name} passed! cycle: {result.cycles}, instret: {result.instret}, CPI: {result.cpi:.3f}")
+
+
+def test_image_at_run_time(tmp_path):
+    # 同一个仿真器运行两个只差一个数据字的镜像，结果不同说明镜像是运行时从工作目录读取的
+    binary = build_config(CPUConfig(predictor="binary", bits=5, init_state="WeaklyB"), sim_threshold=1000000)
+
+    with open(os.path.join(test_cases_path, "sum", "sum.hex"), "r") as f:
+        words = f.read().split()
+    # nums[0] 位于 0x64
+    assert words[0x64 // 4] == "00000001"
+    words[0x64 // 4] = "00000065"
+    patched = os.path.join(tmp_path, "sum_patched.hex")
+    with open(patched, "w") as f:
+        f.write("\n".join(words) + "\n")
+
+    results = []
+    for hex_path in (os.path.join(test_cases_path, "sum", "sum.hex"), patched):
+        result = parse_final_state(run_image(binary, hex_path))
+        assert result, f"Nothing is written back while running {hex_path}"
+        results.append(result.regs[10])
+    assert results == [55, 155]
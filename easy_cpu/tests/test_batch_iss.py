@@ -0,0 +1,48 @@
+import random
+
+import numpy as np
+
+from alu import RV32I_ALU
+from batch_iss import BatchISS, alu_np
+from iss import ISS, alu_int
+from simulator import load_cases
+
+test_cases_path = "asms"
+
+
+def test_alu():
+    rng = random.Random(0)
+    edges = [0, 1, 0x7FFFFFFF, 0x80000000, 0xFFFFFFFF]
+    operants = [(a, b) for a in edges for b in edges]
+    operants += [(rng.getrandbits(32), rng.getrandbits(32)) for _ in range(200)]
+    operant1 = np.array([a for a, _ in operants], dtype=np.int64)
+    operant2 = np.array([b for _, b in operants], dtype=np.int64)
+
+    for op in RV32I_ALU:
+        result = alu_np(np.full(len(operants), op.value), operant1, operant2)
+        expected = [alu_int(op, a, b) for a, b in operants]
+        assert result.tolist() == expected, f"{op.name} mismatch"
+
+
+def test_byte_access():
+    # addi x1, x0, 0x80; sb x1, 0x101(x0); lb x2, 0x101(x0); lbu x3, 0x101(x0); lw x4, 0x100(x0); ebreak
+    image = [0x08000093, 0x101000A3, 0x10100103, 0x10104183, 0x10002203, 0x00100073]
+    batch = BatchISS([image])
+    batch.run()
+    assert batch.regs[0, 2] == 0xFFFFFF80
+    assert batch.regs[0, 3] == 0x80
+    assert batch.regs[0, 4] == 0x00008000
+
+
+def test_asms():
+    test_cases = load_cases(test_cases_path)
+    batch = BatchISS.from_hex([test_case.hex_path for test_case in test_cases])
+    batch.run()
+
+    assert batch.halted.all() and not batch.faulted.any()
+    for lane, test_case in enumerate(test_cases):
+        iss = ISS.from_hex(test_case.hex_path)
+        iss.run()
+        assert batch.regs[lane].tolist() == iss.regs, f"Register mismatch for {test_case.name}"
+        assert batch.pc[lane] == iss.pc and batch.instret[lane] == iss.instret
+        assert batch.regs[lane, 10] == test_case.expected
@@ -0,0 +1,48 @@
+import random
+
+from fuzz import NOP, encode, generate_program, shrink
+from instruction import Instructions, RTypeInstruction
+from iss import ISS, decode_word
+
+
+def test_encode():
+    rng = random.Random(0)
+    for kind in Instructions:
+        for _ in range(20):
+            rd, rs1, rs2 = rng.randrange(32), rng.randrange(32), rng.randrange(32)
+            imm = rng.randrange(-0x800, 0x800) & ~1
+            if kind.value.funct7 is not None and not isinstance(kind.value, RTypeInstruction):
+                imm &= 0x1F
+            d = decode_word(encode(kind, rd, rs1, rs2, imm))
+            assert d.kind == kind, f"{kind.name} decodes as {d.kind.name}"
+            assert not kind.value.has_rd or d.rd == rd
+            assert not kind.value.has_rs1 or d.rs1 == rs1
+            assert not kind.value.has_rs2 or d.rs2 == rs2
+
+
+def test_generate():
+    covered = set()
+    for seed in range(50):
+        program = generate_program(seed, 200, word_only=False)
+        assert len(program) == 200
+        iss = ISS(program)
+        iss.run(10000)
+        assert iss.halted and iss.pc == 4 * (len(program) - 1), f"seed {seed} doesn't reach EBREAK"
+        covered |= {decode_word(code).kind for code in program}
+    assert covered == set(Instructions)
+
+
+def test_generate_word_only():
+    # 默认只生成整字访存，与访存阶段一致
+    subword = {Instructions.LB, Instructions.LH, Instructions.LBU, Instructions.LHU, Instructions.SB, Instructions.SH}
+    for seed in range(20):
+        assert not {decode_word(code).kind for code in generate_program(seed, 200)} & subword
+
+
+def test_shrink():
+    program = generate_program(1, 100)
+    target = encode(Instructions.SUB, 3, 1, 2)
+    program[40] = target
+    shrunk = shrink(program, lambda candidate: target in candidate)
+    assert len(shrunk) == len(program)
+    assert [code for code in shrunk[:-1] if code != NOP] == [target]
@@ -0,0 +1,82 @@
+from iss import ISS, Commit, compare_commits, decode_word
+from instruction import Instructions
+from simulator import load_cases
+
+test_cases_path = "asms"
+
+
+def test_decode():
+    # addi x1, x0, -1
+    d = decode_word(0xFFF00093)
+    assert d.kind == Instructions.ADDI and d.rd == 1 and d.rs1 == 0 and d.imm == 0xFFFFFFFF
+    # sw x2, 8(x1)
+    d = decode_word(0x0020A423)
+    assert d.kind == Instructions.SW and d.rs1 == 1 and d.rs2 == 2 and d.imm == 8
+    # beq x0, x0, -4
+    d = decode_word(0xFE000EE3)
+    assert d.kind == Instructions.BEQ and d.imm == 0xFFFFFFFC
+    # jal x1, 12
+    d = decode_word(0x00C000EF)
+    assert d.kind == Instructions.JAL and d.rd == 1 and d.imm == 12
+
+
+def test_byte_access():
+    iss = ISS([])
+    iss.store(0x101, 0x0, 0x80)
+    assert iss.load(0x100, 0x2) == 0x00008000
+    assert iss.load(0x101, 0x0) == 0xFFFFFF80
+    assert iss.load(0x101, 0x4) == 0x80
+    iss.store(0x102, 0x1, 0x1234)
+    assert iss.load(0x100, 0x2) == 0x12348000
+
+
+def test_compare_commits():
+    expected = [Commit(0, 1, 1), Commit(4, 2, 2)]
+    assert compare_commits(expected, list(expected)) is None
+    divergence = compare_commits(expected, [Commit(0, 1, 1), Commit(4, 2, 3)])
+    assert divergence and divergence.index == 1
+    divergence = compare_commits(expected, expected[:1])
+    assert divergence and divergence.actual is None
+
+
+def test_compare_commits_fills():
+    # 回填的 load 可以晚于之后的指令提交，其余提交必须保持程序顺序
+    expected = [Commit(0, 1, 1), Commit(4, 2, 2), Commit(8, 1, 3)]
+    assert compare_commits(expected, [Commit(4, 2, 2), Commit(0, 1, 1, fill=True), Commit(8, 1, 3)]) is None
+    divergence = compare_commits(expected, [Commit(4, 2, 2), Commit(0, 1, 1), Commit(8, 1, 3)])
+    assert divergence and divergence.index == 0
+    divergence = compare_commits(expected, [Commit(4, 2, 2), Commit(0, 1, 5, fill=True), Commit(8, 1, 3)])
+    assert divergence and divergence.index == 0 and divergence.actual == Commit(0, 1, 5, fill=True)
+    divergence = compare_commits(expected, expected + [Commit(0, 1, 1, fill=True)])
+    assert divergence and divergence.expected is None
+
+    # 丢失或重复某个寄存器的提交时，报告第一条不一致的指令
+    expected = [Commit(0, 1, 1), Commit(4, 2, 2), Commit(8, 3, 3)]
+    divergence = compare_commits(expected, [Commit(0, 1, 1), Commit(8, 3, 3)])
+    assert divergence and divergence.index == 1
+    divergence = compare_commits(expected, [Commit(0, 1, 1), Commit(0, 1, 1), Commit(4, 2, 2), Commit(8, 3, 3)])
+    assert divergence and divergence.index == 1
+
+
+def test_store_to_code():
+    # addi x1, x0, 1; addi x1, x1, 1; ebreak
+    iss = ISS([0x00100093, 0x00108093, 0x00100073])
+    iss.translate(0)
+    assert 0 in iss.blocks
+    # 改为 addi x1, x1, 2
+    assert iss.store(4, 0x2, 0x00208093)
+    assert 0 not in iss.blocks
+    iss.run()
+    assert iss.regs[1] == 3
+
+
+def test_asms():
+    for test_case in load_cases(test_cases_path):
+        interpreted = ISS.from_hex(test_case.hex_path)
+        interpreted.run(translated=False)
+        iss = ISS.from_hex(test_case.hex_path)
+        iss.run()
+        assert iss.halted and iss.pc == 0x8, f"The model is not down properly while testing {test_case.name}"
+        assert iss.regs[10] == test_case.expected, f"Test failed for {test_case.name}"
+        assert iss.instret == interpreted.instret
+        assert compare_commits(interpreted.commits, iss.commits) is None
@@ -0,0 +1,94 @@
+import re
+
+from assassyn.frontend import *
+from assassyn.backend import elaborate
+from assassyn.utils import run_simulator
+
+from prefetcher import StridePrefetcher
+from utils import run_quietly
+
+LINE_BYTES = 16
+
+# 测试访问: (pc, addr, expected_issue, expected_target)，不预取时不检查 target
+Accesses = [
+    # 步长小于一行：预取同方向的下一行
+    (0x104, 0x1000, 0, None),  # 第一次访问，表项缺失
+    (0x104, 0x1004, 0, None),  # 记下步长 4
+    (0x104, 0x1008, 1, 0x1018),  # 步长相同，下一次访问仍在本行，预取下一行
+    (0x104, 0x100C, 1, 0x1010),  # 下一次访问已在下一行，直接预取
+    # 步长大于一行：预取下一次访问
+    (0x208, 0x2000, 0, None),
+    (0x208, 0x2040, 0, None),
+    (0x208, 0x2080, 1, 0x20C0),
+    # 负步长：预取上一行
+    (0x30C, 0x3010, 0, None),
+    (0x30C, 0x300C, 0, None),
+    (0x30C, 0x3008, 1, 0x2FF8),
+    # 置信度较高时偶尔不同的步长不替换原步长
+    (0x104, 0x1010, 1, 0x1020),
+    (0x104, 0x1100, 0, None),
+    (0x104, 0x1104, 1, 0x1114),
+    # 同一表项被另一条指令替换
+    (0x144, 0x5000, 0, None),
+    (0x104, 0x1108, 0, None),
+    # 置信度为 0 时换成新的步长
+    (0x104, 0x110C, 0, None),
+    (0x104, 0x1114, 0, None),
+    (0x104, 0x111C, 1, 0x1124),
+]
+
+
+def check(raw: str):
+    results = re.findall(r"issue=(\d+) target=([0-9A-Fa-f]+)", raw)
+    assert len(results) >= len(Accesses), f"Expected {len(Accesses)} cycles, got {len(results)}"
+
+    for index, ((pc, addr, issue, target), (actual_issue, actual_target)) in enumerate(zip(Accesses, results)):
+        assert int(actual_issue) == issue, f"Cycle {index}, pc=0x{pc:X} addr=0x{addr:X}: expected issue={issue}"
+        if issue:
+            assert (
+                int(actual_target, 16) == target
+            ), f"Cycle {index}, pc=0x{pc:X} addr=0x{addr:X}: expected target 0x{target:X}, got 0x{actual_target}"
+
+        print(f"✓ Cycle {index}: pc=0x{pc:X} addr=0x{addr:X}")
+
+
+class Driver(Module):
+    cycle: Array
+    pc_array: Array
+    addr_array: Array
+
+    def __init__(self):
+        super().__init__(ports={})
+        self.cycle = RegArray(UInt(8), 1)
+        self.pc_array = RegArray(Bits(32), len(Accesses), [x[0] for x in Accesses])
+        self.addr_array = RegArray(Bits(32), len(Accesses), [x[1] for x in Accesses])
+
+    @module.combinational
+    def build(self, prefetcher: StridePrefetcher):
+        pc = self.pc_array[self.cycle[0]]
+        addr = self.addr_array[self.cycle[0]]
+
+        new_cycle = self.cycle[0] + UInt(8)(1)
+        self.cycle[0] = (new_cycle < UInt(8)(len(Accesses))).select(new_cycle, UInt(8)(0))
+
+        # 每周期训练一次，输出本次访问是否预取及预取的地址
+        issue, target = prefetcher.observe(pc, addr, LINE_BYTES)
+        log("issue={} target={:08X}", issue, target)
+
+
+def test_prefetcher():
+    sys = SysBuilder("prefetcher_test")
+    with sys:
+        prefetcher = StridePrefetcher(4)
+        driver = Driver()
+        driver.build(prefetcher)
+
+    sim, _ = elaborate(sys, verbose=False, sim_threshold=len(Accesses) + 1)
+
+    raw, stdout, stderr = run_quietly(run_simulator, sim)
+    assert raw is not None, stderr
+    check(raw)
+
+
+if __name__ == "__main__":
+    test_prefetcher()
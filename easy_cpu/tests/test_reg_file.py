@@ -5,28 +5,33 @@ from assassyn.utils import run_simulator
 from reg_file import RegFile, RegOccupation
 from utils import run_quietly
 
-# 测试指令: (rd, rd_data)
+# 测试指令: (rd, rd_data, fill_rd, fill_data)，fill_rd 为 0 表示本周期没有 MSHR 回填
 Instructions = [
     # 基本写入测试
-    (1, 0x12345678),  # 写入寄存器 x1
-    (2, 0xABCDEF00),  # 写入寄存器 x2
-    (3, 0xFFFFFFFF),  # 写入寄存器 x3 (全1)
-    (4, 0x00000000),  # 写入寄存器 x4 (全0)
-    (5, 0x80000000),  # 写入寄存器 x5 (最高位为1)
+    (1, 0x12345678, 0, 0),  # 写入寄存器 x1
+    (2, 0xABCDEF00, 0, 0),  # 写入寄存器 x2
+    (3, 0xFFFFFFFF, 0, 0),  # 写入寄存器 x3 (全1)
+    (4, 0x00000000, 0, 0),  # 写入寄存器 x4 (全0)
+    (5, 0x80000000, 0, 0),  # 写入寄存器 x5 (最高位为1)
     # 覆盖写入测试
-    (1, 0x11111111),  # 覆盖写入 x1
-    (2, 0x22222222),  # 覆盖写入 x2
+    (1, 0x11111111, 0, 0),  # 覆盖写入 x1
+    (2, 0x22222222, 0, 0),  # 覆盖写入 x2
     # 边界寄存器测试
-    (31, 0xDEADBEEF),  # 写入最后一个寄存器 x31
-    (30, 0xCAFEBABE),  # 写入 x30
+    (31, 0xDEADBEEF, 0, 0),  # 写入最后一个寄存器 x31
+    (30, 0xCAFEBABE, 0, 0),  # 写入 x30
     # x0 寄存器测试 (应该保持为0)
-    (0, 0xFFFFFFFF),  # 尝试写入 x0 (应该被忽略)
-    (0, 0x12345678),  # 再次尝试写入 x0 (应该被忽略)
+    (0, 0xFFFFFFFF, 0, 0),  # 尝试写入 x0 (应该被忽略)
+    (0, 0x12345678, 0, 0),  # 再次尝试写入 x0 (应该被忽略)
     # 混合写入测试
-    (10, 0x10101010),  # 写入 x10
-    (11, 0x01010101),  # 写入 x11
-    (12, 0xF0F0F0F0),  # 写入 x12
-    (13, 0x0F0F0F0F),  # 写入 x13
+    (10, 0x10101010, 0, 0),  # 写入 x10
+    (11, 0x01010101, 0, 0),  # 写入 x11
+    (12, 0xF0F0F0F0, 0, 0),  # 写入 x12
+    (13, 0x0F0F0F0F, 0, 0),  # 写入 x13
+    # 回填测试 (写回级不写寄存器的周期)
+    (0, 0x00000000, 6, 0x0BADF00D),  # 回填 x6
+    (0, 0x00000000, 1, 0x66666666),  # 回填覆盖 x1
+    (0, 0x00000000, 0, 0x77777777),  # 回填 x0 (应该被忽略)
+    (7, 0x70707070, 0, 0),  # 回填之后的写入 x7
 ]
 
 
@@ -59,15 +64,19 @@ def check(raw: str):
 
         # 更新期望的寄存器状态（本周期的写入会在下一个周期可见）
         if index < len(Instructions):
-            rd, rd_data = Instructions[index]
+            rd, rd_data, fill_rd, fill_data = Instructions[index]
             if rd != 0:  # x0 永远为 0
                 expected_regs[rd] = rd_data & 0xFFFFFFFF
+            if fill_rd != 0:
+                expected_regs[fill_rd] = fill_data & 0xFFFFFFFF
 
 
 class Driver(Module):
     cycle: Array
     rd_data_array: Array
     rd_array: Array
+    fill_data_array: Array
+    fill_rd_array: Array
     regs: Array
 
     def __init__(self):
@@ -75,6 +84,8 @@ class Driver(Module):
         self.cycle = RegArray(UInt(8), 1)
         self.rd_data_array = RegArray(Bits(32), len(Instructions), [x[1] for x in Instructions])
         self.rd_array = RegArray(Bits(5), len(Instructions), [x[0] for x in Instructions])
+        self.fill_data_array = RegArray(Bits(32), len(Instructions), [x[3] for x in Instructions])
+        self.fill_rd_array = RegArray(Bits(5), len(Instructions), [x[2] for x in Instructions])
         # 寄存器文件: 32个32位寄存器
         self.regs = RegArray(Bits(32), 32)
 
@@ -84,6 +95,13 @@ class Driver(Module):
         rd = self.rd_array[self.cycle[0]]
         rd_data = self.rd_data_array[self.cycle[0]]
 
+        # 与 D-cache 相同，回填端口只在有回填的周期有效
+        fill_rd = self.fill_rd_array[self.cycle[0]]
+        with Condition(fill_rd != Bits(5)(0)):
+            fill_data = self.fill_data_array[self.cycle[0]]
+            fill_rd = fill_rd | fill_rd
+            fill_data = fill_data | fill_data
+
         new_cycle = self.cycle[0] + UInt(8)(1)
         self.cycle[0] = (new_cycle < UInt(8)(len(Instructions))).select(new_cycle, UInt(8)(0))
 
@@ -94,7 +112,7 @@ class Driver(Module):
         log_format = " ".join(log_parts)
         log(log_format, *[reg_file.regs[i] for i in range(32)])
 
-        return rd, rd_data
+        return self.cycle[0], rd, rd_data, fill_rd, fill_data
 
 
 def test_reg_file():
@@ -102,8 +120,8 @@ def test_reg_file():
     with sys:
         driver = Driver()
         reg_file = RegFile()
-        rd, rd_data = driver.build(reg_file)
-        reg_file.build(rd, rd_data)
+        clocker, rd, rd_data, fill_rd, fill_data = driver.build(reg_file)
+        reg_file.build(clocker, rd, rd_data, fill_rd, fill_data)
 
     sim, _ = elaborate(sys, verbose=False, sim_threshold=len(Instructions) + 1)
 
@@ -5,38 +5,45 @@ from assassyn.utils import run_simulator
 from reg_file import RegOccupation
 from utils import run_quietly
 
-# 测试指令: (occupy_reg, release_reg, expected_changes)
+# 测试指令: (occupy_reg, release_reg, fill_reg, expected_changes)，fill_reg 为 0 表示本周期没有 MSHR 回填
 # expected_changes: 一个字典，表示预期的寄存器占用变化
 Instructions = [
     # 基本占用测试
-    (1, 0, {1: 1}),  # 占用 x1，计数 +1
-    (2, 0, {2: 1}),  # 占用 x2，计数 +1
-    (3, 0, {3: 1}),  # 占用 x3，计数 +1
+    (1, 0, 0, {1: 1}),  # 占用 x1，计数 +1
+    (2, 0, 0, {2: 1}),  # 占用 x2，计数 +1
+    (3, 0, 0, {3: 1}),  # 占用 x3，计数 +1
     # 基本释放测试
-    (0, 1, {1: 0}),  # 释放 x1，计数 -1 回到 0
-    (0, 2, {2: 0}),  # 释放 x2，计数 -1 回到 0
+    (0, 1, 0, {1: 0}),  # 释放 x1，计数 -1 回到 0
+    (0, 2, 0, {2: 0}),  # 释放 x2，计数 -1 回到 0
     # 多次占用同一寄存器
-    (5, 0, {5: 1}),  # 占用 x5，计数 +1
-    (5, 0, {5: 2}),  # 再次占用 x5，计数 +1 到 2
-    (5, 0, {5: 3}),  # 再次占用 x5，计数 +1 到 3
+    (5, 0, 0, {5: 1}),  # 占用 x5，计数 +1
+    (5, 0, 0, {5: 2}),  # 再次占用 x5，计数 +1 到 2
+    (5, 0, 0, {5: 3}),  # 再次占用 x5，计数 +1 到 3
     # 逐步释放
-    (0, 5, {5: 2}),  # 释放 x5，计数 -1 到 2
-    (0, 5, {5: 1}),  # 释放 x5，计数 -1 到 1
-    (0, 5, {5: 0}),  # 释放 x5，计数 -1 到 0
+    (0, 5, 0, {5: 2}),  # 释放 x5，计数 -1 到 2
+    (0, 5, 0, {5: 1}),  # 释放 x5，计数 -1 到 1
+    (0, 5, 0, {5: 0}),  # 释放 x5，计数 -1 到 0
     # 同时占用和释放不同寄存器
-    (10, 3, {10: 1, 3: 0}),  # 占用 x10，释放 x3
-    (11, 10, {11: 1, 10: 0}),  # 占用 x11，释放 x10
+    (10, 3, 0, {10: 1, 3: 0}),  # 占用 x10，释放 x3
+    (11, 10, 0, {11: 1, 10: 0}),  # 占用 x11，释放 x10
     # 同时占用和释放同一寄存器（应该不改变）
-    (7, 7, {}),  # x7 占用和释放，计数不变
+    (7, 7, 0, {}),  # x7 占用和释放，计数不变
     # 边界寄存器测试
-    (31, 0, {31: 1}),  # 占用 x31
-    (30, 0, {30: 1}),  # 占用 x30
-    (0, 31, {31: 0}),  # 释放 x31
-    (0, 30, {30: 0}),  # 释放 x30
+    (31, 0, 0, {31: 1}),  # 占用 x31
+    (30, 0, 0, {30: 1}),  # 占用 x30
+    (0, 31, 0, {31: 0}),  # 释放 x31
+    (0, 30, 0, {30: 0}),  # 释放 x30
     # x0 寄存器测试（应该始终保持为0，不受影响）
-    (0, 0, {}),  # 占用和释放 x0（无效操作）
+    (0, 0, 0, {}),  # 占用和释放 x0（无效操作）
     # 复杂场景
-    (15, 11, {15: 1, 11: 0}),  # 占用 x15，释放 x11
+    (15, 11, 0, {15: 1, 11: 0}),  # 占用 x15，释放 x11
+    # 回填释放测试 (写回级不释放寄存器的周期)
+    (20, 0, 0, {20: 1}),  # 占用 x20，等待回填
+    (0, 0, 0, {}),  # 写回级空闲，未回填
+    (21, 0, 0, {21: 1}),  # 占用 x21
+    (0, 0, 20, {20: 0}),  # 回填 x20，释放占用
+    (22, 0, 21, {22: 1, 21: 0}),  # 占用 x22，同时回填 x21
+    (0, 15, 0, {15: 0}),  # 回填之后写回级照常释放 x15
 ]
 
 
@@ -69,7 +76,7 @@ def check(raw: str):
 
         # 更新期望的占用状态（本周期的操作会在下一个周期可见）
         if index < len(Instructions):
-            occupy_reg, release_reg, expected_changes = Instructions[index]
+            occupy_reg, release_reg, fill_reg, expected_changes = Instructions[index]
 
             # 应用预期的变化
             for reg, new_count in expected_changes.items():
@@ -80,12 +87,14 @@ class Driver(Module):
     cycle: Array
     occupy_reg_array: Array
     release_reg_array: Array
+    fill_reg_array: Array
 
     def __init__(self):
         super().__init__(ports={})
         self.cycle = RegArray(UInt(8), 1)
         self.occupy_reg_array = RegArray(Bits(5), len(Instructions), [x[0] for x in Instructions])
         self.release_reg_array = RegArray(Bits(5), len(Instructions), [x[1] for x in Instructions])
+        self.fill_reg_array = RegArray(Bits(5), len(Instructions), [x[2] for x in Instructions])
 
     @module.combinational
     def build(self, reg_occupation: RegOccupation):
@@ -93,6 +102,11 @@ class Driver(Module):
         occupy_reg = self.occupy_reg_array[self.cycle[0]]
         release_reg = self.release_reg_array[self.cycle[0]]
 
+        # 与 D-cache 相同，回填端口只在有回填的周期有效
+        fill_reg = self.fill_reg_array[self.cycle[0]]
+        with Condition(fill_reg != Bits(5)(0)):
+            fill_reg = fill_reg | fill_reg
+
         new_cycle = self.cycle[0] + UInt(8)(1)
         self.cycle[0] = (new_cycle < UInt(8)(len(Instructions))).select(new_cycle, UInt(8)(0))
 
@@ -103,7 +117,7 @@ class Driver(Module):
         log_format = " ".join(log_parts)
         log(log_format, *[reg_occupation.occupies[i][0] for i in range(32)])
 
-        return occupy_reg, release_reg
+        return self.cycle[0], occupy_reg, release_reg, fill_reg
 
 
 def test_reg_occupation():
@@ -111,8 +125,8 @@ def test_reg_occupation():
     with sys:
         driver = Driver()
         reg_occupation = RegOccupation(verbose=False)
-        occupy_reg, release_reg = driver.build(reg_occupation)
-        reg_occupation.build(occupy_reg, release_reg, None)
+        clocker, occupy_reg, release_reg, fill_reg = driver.build(reg_occupation)
+        reg_occupation.build(clocker, occupy_reg, release_reg, None, fill_reg)
 
     sim, _ = elaborate(sys, verbose=False, sim_threshold=len(Instructions) + 1)
 